@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+"""In-process stand-in for the katalog object store endpoint.
+
+Implements just enough of the katalog API for benchmarking ObjectStore,
+objects are kept in memory.
+"""
+import json
+import hashlib
+import threading
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _path(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/', 3)
+        return parts, parse_qs(url.query)
+
+    def _body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _reply(self, status, body=b'', headers=None, head=False):
+        self.send_response(status)
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _object_headers(self, obj):
+        headers = {'Content-Type': obj['content_type'],
+                   'ETag': obj['hash'],
+                   'X-MD5Hash': obj['hash']}
+        if obj['content_encoding']:
+            headers['Content-Encoding'] = obj['content_encoding']
+        return headers
+
+    def _listing(self, parts, query):
+        prefix = query.get('prefix', [''])[0]
+        marker = query.get('marker', [''])[0]
+        limit = int(query.get('limit', ['10000'])[0])
+        if len(parts) == 3:
+            names = self.server.objects.get((parts[1], parts[2],), {})
+            listing = [{'name': name,
+                        'bytes': len(names[name]['body']),
+                        'hash': names[name]['hash']}
+                       for name in sorted(names)
+                       if name.startswith(prefix) and name > marker]
+        else:
+            listing = [{'name': container}
+                       for tenant, container in sorted(self.server.objects)
+                       if (len(parts) == 1 or tenant == parts[1]) and
+                       container.startswith(prefix) and container > marker]
+        body = json.dumps(listing[:limit]).encode('utf-8')
+        self._reply(200, body, {'Content-Type': 'application/json'})
+
+    def _lookup(self, parts):
+        if len(parts) != 4:
+            return None, None
+        container = self.server.objects.get((parts[1], parts[2],))
+        if container is None:
+            return None, None
+        return container, container.get(parts[3])
+
+    def do_PUT(self):
+        parts, query = self._path()
+        body = self._body()
+        if len(parts) != 4:
+            return self._reply(400)
+        md5hash = hashlib.md5(body).hexdigest()
+        with self.server.lock:
+            container = self.server.objects.setdefault(
+                (parts[1], parts[2],), {})
+            container[parts[3]] = {
+                'body': body,
+                'hash': md5hash,
+                'content_type': self.headers.get('Content-Type',
+                                                 'application/octet-stream'),
+                'content_encoding': self.headers.get('Content-Encoding')
+            }
+        self._reply(201, headers={'ETag': md5hash, 'X-MD5Hash': md5hash})
+
+    def do_GET(self, head=False):
+        parts, query = self._path()
+        if len(parts) < 4:
+            return self._listing(parts, query)
+        container, obj = self._lookup(parts)
+        if obj is None:
+            return self._reply(404, head=head)
+        self._reply(200, obj['body'], self._object_headers(obj), head=head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_DELETE(self):
+        parts, query = self._path()
+        with self.server.lock:
+            container, obj = self._lookup(parts)
+            if obj is None:
+                return self._reply(404)
+            del container[parts[3]]
+        self._reply(204)
+
+
+class Katalog(ThreadingMixIn, HTTPServer):
+    """Katalog stand-in server on localhost.
+
+    Example usage:
+
+    .. code:: python
+
+        with Katalog() as katalog:
+            client.endpoints['katalog'] = katalog.url
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port,), Handler)
+        self.objects = {}
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % self.server_address
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+"""ObjectStore throughput benchmark.
+
+Measures put and get throughput and latency across object sizes,
+concurrency levels and codecs against an in-process katalog stand-in.
+Results are written as JSON for comparison between releases.
+
+Example usage:
+
+.. code:: bash
+
+    $ python3 benchmarks/objectstore.py --output bench.json
+    $ python3 benchmarks/objectstore.py --sizes 1024 1048576 \\
+        --concurrency 1 8 --codecs none gzip --count 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from psychokinetic import metadata  # noqa
+from psychokinetic.client import Client  # noqa
+from psychokinetic.utils.workers import imap  # noqa
+
+from katalog import Katalog  # noqa
+
+TENANT = 'benchmark'
+
+
+def payload(size):
+    # Half random, half zeros, so codecs have something to compress.
+    half = size // 2
+    return os.urandom(half) + bytes(size - half)
+
+
+def percentile(values, percent):
+    index = min(len(values) - 1, int(round(percent / 100.0 *
+                                           (len(values) - 1))))
+    return values[index]
+
+
+def measure(call, names, workers):
+    def timed(name):
+        start = time.perf_counter()
+        call(name)
+        return time.perf_counter() - start
+
+    latencies = []
+    start = time.perf_counter()
+    for name, future in imap(timed, names, workers, ordered=False):
+        latencies.append(future.result())
+    elapsed = time.perf_counter() - start
+
+    return elapsed, sorted(latencies)
+
+
+def record(operation, size, workers, codec, count, elapsed, latencies):
+    return {
+        'operation': operation,
+        'size': size,
+        'concurrency': workers,
+        'codec': codec,
+        'count': count,
+        'seconds': elapsed,
+        'ops_per_second': count / elapsed,
+        'mb_per_second': count * size / elapsed / 1048576,
+        'latency': {
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1]
+        }
+    }
+
+
+def bench(client, size, workers, codec, count):
+    container = 'size%s-workers%s-%s' % (size, workers, codec or 'none')
+    data = payload(size)
+    names = ['object%s' % i for i in range(count)]
+
+    def put(name):
+        client.put_object(TENANT, container, name, data,
+                          raw=True, codec=codec)
+
+    def get(name):
+        reader = client.get_object(TENANT, container, name)
+        try:
+            for chunk in reader:
+                pass
+        finally:
+            reader.close()
+
+    def unlink(name):
+        client.unlink_object(TENANT, container, name)
+
+    results = []
+    elapsed, latencies = measure(put, names, workers)
+    results.append(record('put', size, workers, codec, count,
+                          elapsed, latencies))
+    elapsed, latencies = measure(get, names, workers)
+    results.append(record('get', size, workers, codec, count,
+                          elapsed, latencies))
+    measure(unlink, names, workers)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ObjectStore benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1024, 65536, 1048576, 8388608],
+                        help='Object sizes in bytes')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 4, 16],
+                        help='Concurrent requests')
+    parser.add_argument('--codecs', nargs='+',
+                        default=['none', 'gzip'],
+                        choices=['none', 'gzip', 'bz2', 'xz'],
+                        help='Codecs to compress objects with')
+    parser.add_argument('--count', type=int, default=100,
+                        help='Objects per run')
+    parser.add_argument('--output', default=None,
+                        help='JSON results file, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    with Katalog() as katalog:
+        client = Client(url=katalog.url)
+        client.endpoints['katalog'] = katalog.url
+        for size in args.sizes:
+            for workers in args.concurrency:
+                for codec in args.codecs:
+                    codec = None if codec == 'none' else codec
+                    for result in bench(client, size, workers, codec,
+                                        args.count):
+                        results.append(result)
+                        print('%-4s %10s bytes x%-3s %-5s %10.2f MB/s'
+                              ' p50 %8.2f ms p99 %8.2f ms' % (
+                                  result['operation'],
+                                  size,
+                                  workers,
+                                  codec or 'none',
+                                  result['mb_per_second'],
+                                  result['latency']['p50'] * 1000,
+                                  result['latency']['p99'] * 1000),
+                              file=sys.stderr)
+
+    report = {
+        'package': metadata.package,
+        'version': metadata.version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == '__main__':
+    main()
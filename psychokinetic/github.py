@@ -27,23 +27,225 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
 from luxon.utils.http import Client, parse_link_header
 
+from psychokinetic.utils.workers import imap, status_of
+from psychokinetic.utils.httpcache import HTTPCache
+from psychokinetic.utils.ratelimit import Scheduler
+
+
+def _link(links, rel):
+    link = getattr(links, rel, None)
+    if link:
+        return link[0]['link']
+    return None
+
+
+def _page_urls(next_url, last_url):
+    # Build URLs of remaining pages from the 'next' and 'last' links.
+    # Returns None when the links are not numbered pages.
+    try:
+        split = urlsplit(last_url)
+        query = parse_qsl(split.query)
+        first = int(dict(parse_qsl(urlsplit(next_url).query))['page'])
+        last = int(dict(query)['page'])
+    except (KeyError, ValueError):
+        return None
+
+    urls = []
+    for page in range(first, last + 1):
+        page_query = [(k, v if k != 'page' else str(page),)
+                      for k, v in query]
+        urls.append(urlunsplit(split._replace(query=urlencode(page_query))))
+    return urls
+
+
+def _rate_limited(error, headers):
+    # Returns (limited, seconds) for error responses. seconds is None when
+    # the wait is until the rate limit budget resets.
+    if status_of(error) not in (403, 429,):
+        return (False, None,)
+
+    headers = headers or {}
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        try:
+            return (True, float(retry_after),)
+        except ValueError:
+            pass
+
+    if str(headers.get('X-RateLimit-Remaining')) == '0':
+        return (True, None,)
+
+    if 'rate limit' in str(error).lower():
+        return (True, 60,)
+
+    return (False, None,)
+
+
+class _CachedResponse(object):
+    # Response served from cache after '304 Not Modified'.
+    status_code = 304
+
+    def __init__(self, cached):
+        self.headers = cached['headers']
+        self.json = cached['body']
+
 
 class GitHub(Client):
-    def __init__(self, auth=None):
+    """Restclient for GitHub API v3.
+
+    GET requests are optionally cached on disk. Cached responses are
+    revalidated with conditional requests, GitHub does not count
+    '304 Not Modified' responses against the rate limit.
+
+    All requests pass through a rate limit aware scheduler. Requests that
+    hit the primary or secondary rate limit wait and are retried.
+
+    Args:
+        auth (tuple): ('username', 'token') pair. (optional)
+        workers (int): Maximum concurrent requests when fetching pages.
+            Defaults to 8.
+        cache (str): Path of cache database file. (optional)
+        cache_size (int): Maximum cached responses. Defaults to 10000.
+        scheduler (Scheduler): Share a scheduler between clients using the
+            same credentials. (optional)
+        retries (int): Retries of rate limited requests. Defaults to 3.
+    """
+    def __init__(self, auth=None, workers=8, cache=None, cache_size=10000,
+                 scheduler=None, retries=3):
         super().__init__('https://api.github.com', auth=auth)
+        self._workers = workers
+        self._scheduler = scheduler or Scheduler(workers)
+        self._retries = retries
+        self._cache = None
+        if cache is not None:
+            self._cache = HTTPCache(cache, cache_size)
+        # Responses differ per user, without storing credentials in cache.
+        self._cache_user = hashlib.sha256(repr(auth).encode()).hexdigest()
+
+    def _cache_key(self, url, headers, params):
+        key = [self._cache_user, url,
+               urlencode(sorted((params or {}).items())),
+               headers.get('accept', '')]
+        return hashlib.sha256('|'.join(key).encode()).hexdigest()
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    def _send(self, method, url, headers, params=None, priority=0,
+              data=None, resource='core'):
+        attempt = 0
+        while True:
+            self._scheduler.acquire(priority, resource)
+            response_headers = None
+            try:
+                response = super().execute(method, url, headers=headers,
+                                           params=params, data=data)
+                response_headers = response.headers
+                return response
+            except Exception as error:
+                response_headers = getattr(getattr(error, 'response', None),
+                                           'headers', None)
+                limited, seconds = _rate_limited(error, response_headers)
+                if not limited or attempt >= self._retries:
+                    raise
+                self._scheduler.backoff(seconds, resource)
+            finally:
+                self._scheduler.release(response_headers, resource)
+            attempt += 1
+
+    def _request(self, method, url, headers, params=None, priority=0):
+        if self._cache is None or method != 'GET':
+            return self._send(method, url, headers, params, priority)
+
+        key = self._cache_key(url, headers, params)
+        cached = self._cache.get(key)
+        if cached is not None:
+            headers = headers.copy()
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['modified']:
+                headers['If-Modified-Since'] = cached['modified']
+
+        response = self._send(method, url, headers, params, priority)
+
+        if response.status_code == 304 and cached is not None:
+            return _CachedResponse(cached)
+
+        etag = response.headers.get('ETag')
+        modified = response.headers.get('Last-Modified')
+        if etag or modified:
+            self._cache.set(key, etag, modified,
+                            {'link': response.headers.get('link')},
+                            response.json)
+
+        return response
+
+    def _pages(self, method, url, headers, params, priority=0, ahead=True):
+        response = self._request(method, url, headers, params, priority)
+        yield response
+
+        links = parse_link_header(response.headers.get('link'))
+        next_url = _link(links, 'next')
+        if next_url is None:
+            return
 
-    def execute(self, method, url, headers={}, **kwargs):
-        headers = headers.copy()
-        response = super().execute(method, url, headers=headers, params=kwargs)
+        urls = None
+        if ahead:
+            urls = _page_urls(next_url, _link(links, 'last'))
+        if urls is not None:
+            def fetch(page_url):
+                return self._request('GET', page_url, headers,
+                                     priority=priority)
+
+            for page_url, future in imap(fetch, urls, self._workers):
+                yield future.result()
+        else:
+            while next_url is not None:
+                response = self._request('GET', next_url, headers,
+                                         priority=priority)
+                yield response
+                links = parse_link_header(response.headers.get('link'))
+                next_url = _link(links, 'next')
+
+    def paginate(self, method, url, headers={}, priority=0, ahead=True,
+                 **kwargs):
+        """Iterate over all items of a list, page by page.
+
+        When GitHub provides a 'last' link, the remaining pages are fetched
+        concurrently while items are yielded in order.
+
+        Args:
+            method (str): HTTP method.
+            url (str): URL or URI of list.
+            headers (dict): Additional headers. (optional)
+            priority (int): Scheduling priority, higher starts first.
+                Defaults to 0.
+            ahead (bool): Fetch remaining pages ahead concurrently. When
+                False pages are only requested as items are consumed, so
+                stopping early saves requests. Defaults to True.
+            kwargs (kwargs): Query parameters.
+
+        Returns generator of items.
+        """
+        for response in self._pages(method, url, headers.copy(), kwargs,
+                                    priority, ahead):
+            if not isinstance(response.json, list):
+                raise ValueError("Not a list '%s'" % url)
+            yield from response.json
+
+    def execute(self, method, url, headers={}, priority=0, **kwargs):
+        pages = self._pages(method, url, headers.copy(), kwargs, priority)
+        response = next(pages)
         if isinstance(response.json, list):
             responses = [] + response.json
-            links = parse_link_header(response.headers.get('link'))
-            if links.next is not None:
-                responses += super().execute('GET',
-                                             links.next[0]['link'],
-                                             params=kwargs).json
+            for response in pages:
+                responses += response.json
 
             return responses
 
@@ -71,6 +273,30 @@ class GitHub(Client):
                                        (user, repo,))
         return github_branches
 
+    def inventory(self, user):
+        """Iterate over repositories with their tags and branches.
+
+        Tags and branches of repositories are fetched concurrently, starting
+        as soon as the first page of repositories arrives. All requests
+        share the client connections and rate limit scheduler.
+
+        Args:
+            user (str): User or organisation.
+
+        Returns generator of dicts with 'repo', 'tags' and 'branches', one
+        per repository as it completes.
+        """
+        def fetch(github_repo):
+            name = github_repo['name']
+            return {'repo': github_repo,
+                    'tags': self.tags(user, name),
+                    'branches': self.branches(user, name)}
+
+        github_repos = self.paginate('GET', '/users/%s/repos' % user)
+        for github_repo, future in imap(fetch, github_repos, self._workers,
+                                        ordered=False):
+            yield future.result()
+
     def teams(self, user):
         headers = {'accept': 'application/vnd.github.inertia-preview+json'}
         github_teams = self.execute('GET',
@@ -101,17 +327,39 @@ class GitHub(Client):
 
         return found_events
 
+    def iter_events(self, user, repo=None):
+        """Iterate over events of repositories.
+
+        Without repo, events of all repositories of user are fetched
+        concurrently. Events of each repository are yielded as soon as it
+        completes, in no specific order between repositories.
+
+        Args:
+            user (str): User or organisation.
+            repo (str): Name of repository. (optional)
+
+        Returns generator of events.
+        """
+        if repo is not None:
+            yield from self._events(user, repo)
+            return
+
+        def fetch(name):
+            return self._events(user, name)
+
+        names = (github_repo['name'] for github_repo in self.repos(user))
+        for name, future in imap(fetch, names, self._workers,
+                                 ordered=False):
+            yield from future.result()
+
     def events(self, user, repo=None):
-        github_repos = self.repos(user)
-        found_events = []
-        if repo is None:
-            for github_repo in github_repos:
-                repo = github_repo['name']
-                found_events += self._events(user, repo)
-        else:
-            found_events = self._events(user, repo)
+        if repo is not None:
+            return self._events(user, repo)
 
-        return found_events
+        # Newest first, as GitHub orders events of a single repository.
+        return sorted(self.iter_events(user),
+                      key=lambda event: event['created_at'],
+                      reverse=True)
 
     def commits(self, user, repo, **kwargs):
         return self.execute('GET', '/repos/%s/%s/commits' % (user,
@@ -122,6 +370,13 @@ class GitHub(Client):
         headers = {'accept': 'application/vnd.github.inertia-preview+json'}
         github_projects = self.execute('GET', '/orgs/%s/projects' % user,
                                        headers=headers)
+
+        def fetch(url):
+            return self.execute('GET', url, headers=headers)
+
+        # Requests are made in stages, each stage concurrently across all
+        # projects, columns and cards respectively.
+        open_projects = []
         for github_project in github_projects:
             id = github_project['id']
             name = github_project['name']
@@ -134,48 +389,59 @@ class GitHub(Client):
             projects[id]['url'] = html_url
             projects[id]['columns'] = []
             if state == 'open':
-                github_columns = self.execute('GET',
-                                              '/projects/%s/columns' % id,
-                                              headers=headers)
-                for github_column in github_columns:
-                    column = {}
-                    projects[id]['columns'].append(column)
-
-                    column_id = github_column['id']
-                    column_name = github_column['name']
-                    column['name'] = column_name
-                    column['cards'] = []
-
-                    github_cards = self.execute('GET',
-                                                'projects/columns/%s/cards' %
-                                                column_id,
-                                                headers=headers)
-                    for github_card in github_cards:
-                        card = {}
-                        column['cards'].append(card)
-
-                        note = github_card['note']
-                        card['assignees'] = []
-                        if 'content_url' in github_card:
-                            content_url = github_card['content_url']
-                            github_card_content = self.execute(
-                                'GET',
-                                content_url,
-                                headers=headers
-                            )
-                            title = github_card_content['title']
-                            card['title'] = title
-                            body = github_card_content['body']
-                            card['body'] = body
-                            html_url = github_card_content['html_url']
-                            card['html_url'] = html_url
-                            assignees = github_card_content['assignees']
-                            for assignee in assignees:
-                                login = assignee['login']
-                                card['assignees'].append(login)
-                        else:
-                            card['title'] = 'Note'
-                            card['body'] = note
-                            card['html_url'] = None
+                open_projects.append(id)
+
+        columns = []
+        for id, future in imap(lambda id: fetch('/projects/%s/columns' % id),
+                               open_projects, self._workers):
+            for github_column in future.result():
+                column = {}
+                projects[id]['columns'].append(column)
+
+                column_id = github_column['id']
+                column_name = github_column['name']
+                column['name'] = column_name
+                column['cards'] = []
+                columns.append((column, column_id,))
+
+        cards = []
+        for (column, column_id), future in imap(
+                lambda column: fetch('projects/columns/%s/cards' % column[1]),
+                columns, self._workers):
+            for github_card in future.result():
+                card = {}
+                column['cards'].append(card)
+                card['assignees'] = []
+                cards.append((card, github_card,))
+
+        # Cards referencing the same issue or pull request are fetched once.
+        content_urls = {}
+        for card, github_card in cards:
+            if 'content_url' in github_card:
+                content_urls[github_card['content_url']] = None
+
+        contents = {}
+        for content_url, future in imap(fetch, content_urls, self._workers,
+                                        ordered=False):
+            contents[content_url] = future.result()
+
+        for card, github_card in cards:
+            note = github_card['note']
+            if 'content_url' in github_card:
+                github_card_content = contents[github_card['content_url']]
+                title = github_card_content['title']
+                card['title'] = title
+                body = github_card_content['body']
+                card['body'] = body
+                html_url = github_card_content['html_url']
+                card['html_url'] = html_url
+                assignees = github_card_content['assignees']
+                for assignee in assignees:
+                    login = assignee['login']
+                    card['assignees'].append(login)
+            else:
+                card['title'] = 'Note'
+                card['body'] = note
+                card['html_url'] = None
 
         return projects
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from luxon.exceptions import Error
+
+from psychokinetic.github import GitHub
+from psychokinetic.utils.workers import imap
+
+API = 'https://api.github.com'
+
+REPOSITORY = '''
+fragment repository on Repository {
+  databaseId
+  id
+  name
+  nameWithOwner
+  isPrivate
+  isFork
+  isArchived
+  description
+  url
+  homepageUrl
+  primaryLanguage { name }
+  defaultBranchRef { name }
+  createdAt
+  updatedAt
+  pushedAt
+  stargazers { totalCount }
+  forkCount
+  diskUsage
+  owner { login }
+}
+'''
+
+REF = '''
+fragment ref on Ref {
+  name
+  target {
+    id
+    oid
+    ... on Tag { target { oid } }
+  }
+  branchProtectionRule { id }
+}
+'''
+
+PAGE = 'pageInfo { hasNextPage endCursor }'
+
+REPOS = REPOSITORY + '''
+query($login: String!, $cursor: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: 100, after: $cursor,
+                 ownerAffiliations: [OWNER]) {
+      %s
+      nodes { ...repository }
+    }
+  }
+}
+''' % PAGE
+
+REFS = REF + '''
+query($owner: String!, $name: String!, $prefix: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    refs(refPrefix: $prefix, first: 100, after: $cursor) {
+      %s
+      nodes { ...ref }
+    }
+  }
+}
+''' % PAGE
+
+INVENTORY = REPOSITORY + REF + '''
+query($login: String!, $cursor: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: 25, after: $cursor,
+                 ownerAffiliations: [OWNER]) {
+      %s
+      nodes {
+        ...repository
+        tags: refs(refPrefix: "refs/tags/", first: 100) {
+          %s
+          nodes { ...ref }
+        }
+        branches: refs(refPrefix: "refs/heads/", first: 100) {
+          %s
+          nodes { ...ref }
+        }
+      }
+    }
+  }
+}
+''' % (PAGE, PAGE, PAGE,)
+
+CARD = '''
+fragment card on ProjectCard {
+  note
+  content {
+    ... on Issue {
+      title body url assignees(first: 10) { nodes { login } }
+    }
+    ... on PullRequest {
+      title body url assignees(first: 10) { nodes { login } }
+    }
+  }
+}
+'''
+
+# GitHub limits a query to 500,000 nodes, nested first arguments multiply.
+# Cards are therefore fetched per column, rather than nested in projects.
+PROJECTS = '''
+query($login: String!, $cursor: String) {
+  organization(login: $login) {
+    projects(first: 20, after: $cursor) {
+      %s
+      nodes {
+        id
+        databaseId
+        name
+        body
+        state
+        url
+        columns(first: 50) {
+          %s
+          nodes { id name }
+        }
+      }
+    }
+  }
+}
+''' % (PAGE, PAGE,)
+
+COLUMNS = '''
+query($id: ID!, $cursor: String) {
+  node(id: $id) {
+    ... on Project {
+      columns(first: 50, after: $cursor) {
+        %s
+        nodes { id name }
+      }
+    }
+  }
+}
+''' % PAGE
+
+COLUMN_CARDS = CARD + '''
+query($id: ID!, $cursor: String) {
+  node(id: $id) {
+    ... on ProjectColumn {
+      cards(first: 100, after: $cursor, archivedStates: [NOT_ARCHIVED]) {
+        %s
+        nodes { ...card }
+      }
+    }
+  }
+}
+''' % PAGE
+
+
+def _repo(node):
+    owner = node['owner']['login']
+    full_name = node['nameWithOwner']
+    return {
+        'id': node['databaseId'],
+        'node_id': node['id'],
+        'name': node['name'],
+        'full_name': full_name,
+        'owner': {'login': owner},
+        'private': node['isPrivate'],
+        'fork': node['isFork'],
+        'archived': node['isArchived'],
+        'description': node['description'],
+        'html_url': node['url'],
+        'url': '%s/repos/%s' % (API, full_name,),
+        'homepage': node['homepageUrl'],
+        'language': (node['primaryLanguage'] or {}).get('name'),
+        'default_branch': (node['defaultBranchRef'] or {}).get('name'),
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'pushed_at': node['pushedAt'],
+        'stargazers_count': node['stargazers']['totalCount'],
+        'watchers_count': node['stargazers']['totalCount'],
+        'forks_count': node['forkCount'],
+        'size': node['diskUsage'],
+    }
+
+
+def _sha(node):
+    target = node['target']
+    # Annotated tags point to a tag object, which points to the commit.
+    if 'target' in target:
+        return target['target']['oid']
+    return target['oid']
+
+
+def _tag(user, repo, node):
+    sha = _sha(node)
+    return {
+        'name': node['name'],
+        'zipball_url': '%s/repos/%s/%s/zipball/refs/tags/%s' % (
+            API, user, repo, node['name'],),
+        'tarball_url': '%s/repos/%s/%s/tarball/refs/tags/%s' % (
+            API, user, repo, node['name'],),
+        'commit': {
+            'sha': sha,
+            'url': '%s/repos/%s/%s/commits/%s' % (API, user, repo, sha,)
+        },
+        'node_id': node['target']['id'],
+    }
+
+
+def _branch(user, repo, node):
+    sha = _sha(node)
+    return {
+        'name': node['name'],
+        'commit': {
+            'sha': sha,
+            'url': '%s/repos/%s/%s/commits/%s' % (API, user, repo, sha,)
+        },
+        'protected': node['branchProtectionRule'] is not None,
+    }
+
+
+def _card(node):
+    card = {}
+    card['assignees'] = []
+    content = node['content']
+    if content:
+        card['title'] = content['title']
+        card['body'] = content['body']
+        card['html_url'] = content['url']
+        for assignee in content['assignees']['nodes']:
+            card['assignees'].append(assignee['login'])
+    else:
+        card['title'] = 'Note'
+        card['body'] = node['note']
+        card['html_url'] = None
+    return card
+
+
+class GitHubGraphQL(GitHub):
+    """GitHub client using GraphQL API v4 for inventories.
+
+    repos, tags, branches and projects return the same structures as the
+    REST API v3 based GitHub client, but nested data is requested in bulk,
+    reducing hundreds of requests to a few paginated queries. Repository
+    dicts contain the commonly used fields only. All other methods use
+    the REST API.
+
+    Args:
+        Refer to psychokinetic.github.GitHub. Authentication is required
+        for GraphQL.
+    """
+    def query(self, query, **variables):
+        """Execute GraphQL query.
+
+        Args:
+            query (str): GraphQL query.
+            variables (kwargs): Query variables.
+
+        Returns data of response.
+        """
+        # GraphQL has its own budget, counted in points.
+        response = self._send('POST', '/graphql', {},
+                              data={'query': query,
+                                    'variables': variables},
+                              resource='graphql')
+        result = response.json
+        if result.get('errors'):
+            raise Error('GitHub GraphQL %s' %
+                        '; '.join(error.get('message', '')
+                                  for error in result['errors']))
+        return result['data']
+
+    def _connection(self, query, path, cursor=None, **variables):
+        # Yields nodes of connection at path across all pages.
+        while True:
+            connection = self.query(query, cursor=cursor, **variables)
+            for key in path:
+                connection = connection[key]
+                if connection is None:
+                    return
+            yield from connection['nodes']
+            if not connection['pageInfo']['hasNextPage']:
+                return
+            cursor = connection['pageInfo']['endCursor']
+
+    def _remaining(self, connection, query, path, **variables):
+        # Yields nodes of nested connection, fetching further pages.
+        yield from connection['nodes']
+        if connection['pageInfo']['hasNextPage']:
+            yield from self._connection(
+                query, path,
+                cursor=connection['pageInfo']['endCursor'],
+                **variables)
+
+    def _refs(self, user, repo, prefix):
+        return self._connection(REFS, ('repository', 'refs',),
+                                owner=user, name=repo, prefix=prefix)
+
+    def repos(self, user):
+        return [_repo(node)
+                for node in self._connection(REPOS, ('repositoryOwner',
+                                                     'repositories',),
+                                             login=user)]
+
+    def tags(self, user, repo):
+        return [_tag(user, repo, node)
+                for node in self._refs(user, repo, 'refs/tags/')]
+
+    def branches(self, user, repo):
+        return [_branch(user, repo, node)
+                for node in self._refs(user, repo, 'refs/heads/')]
+
+    def inventory(self, user):
+        """Iterate over repositories with their tags and branches.
+
+        Returns generator of dicts with 'repo', 'tags' and 'branches'.
+        """
+        for node in self._connection(INVENTORY, ('repositoryOwner',
+                                                 'repositories',),
+                                     login=user):
+            repo = node['name']
+            path = ('repository', 'refs',)
+            tags = self._remaining(node['tags'], REFS, path,
+                                   owner=user, name=repo,
+                                   prefix='refs/tags/')
+            branches = self._remaining(node['branches'], REFS, path,
+                                       owner=user, name=repo,
+                                       prefix='refs/heads/')
+            yield {'repo': _repo(node),
+                   'tags': [_tag(user, repo, tag) for tag in tags],
+                   'branches': [_branch(user, repo, branch)
+                                for branch in branches]}
+
+    def projects(self, user):
+        projects = {}
+        columns = []
+        for github_project in self._connection(PROJECTS,
+                                               ('organization',
+                                                'projects',),
+                                               login=user):
+            id = github_project['databaseId']
+            projects[id] = {}
+            projects[id]['name'] = github_project['name']
+            projects[id]['description'] = github_project['body']
+            projects[id]['url'] = github_project['url']
+            projects[id]['columns'] = []
+            if github_project['state'] != 'OPEN':
+                continue
+
+            github_columns = self._remaining(github_project['columns'],
+                                             COLUMNS, ('node', 'columns',),
+                                             id=github_project['id'])
+            for github_column in github_columns:
+                column = {}
+                projects[id]['columns'].append(column)
+                column['name'] = github_column['name']
+                columns.append((column, github_column['id'],))
+
+        def fetch(column_id):
+            return [_card(github_card)
+                    for github_card in self._connection(COLUMN_CARDS,
+                                                        ('node', 'cards',),
+                                                        id=column_id)]
+
+        # Cards of columns are queried concurrently.
+        for (column, column_id), future in imap(
+                lambda column: fetch(column[1]), columns, self._workers):
+            column['cards'] = future.result()
+
+        return projects
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import json
+import gzip
+import threading
+
+
+def _commit_date(commit):
+    return commit['commit']['committer']['date']
+
+
+class GitHubSync(object):
+    """Incremental commit and event sync for GitHub repositories.
+
+    Keeps a high-water mark per repository and only requests newer commits
+    and events, so runs cost in proportion to new activity. Results are
+    appended to compressed JSON lines files in the store directory.
+
+    Commits are requested using 'since' from the newest committer date
+    seen. Commits with older committer dates pushed afterwards, such as
+    rebased branches, are not picked up.
+
+    Args:
+        github (obj): psychokinetic.GitHub obj.
+        path (str): Store directory.
+
+    Example usage:
+
+    .. code:: python
+
+        sync = GitHubSync(GitHub(auth=auth), '/var/lib/github')
+        new_commits = sync.sync_commits('TachyonicProject', 'luxon')
+        all_commits = list(sync.commits('TachyonicProject', 'luxon'))
+    """
+    def __init__(self, github, path):
+        self._github = github
+        self._path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._state_path = os.path.join(path, 'state.json')
+        try:
+            with open(self._state_path, 'r') as f:
+                self._state = json.load(f)
+        except FileNotFoundError:
+            self._state = {}
+
+    def _mark(self, user, repo, kind):
+        with self._lock:
+            return self._state.get('%s/%s' % (user, repo,), {}).get(kind)
+
+    def _store(self, user, repo, kind, items, mark):
+        if items:
+            directory = os.path.join(self._path, kind, user)
+            os.makedirs(directory, exist_ok=True)
+            # Appending to gzip adds a member, readers see one stream.
+            with gzip.open(os.path.join(directory, repo + '.jsonl.gz'),
+                           'at', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, separators=(',', ':',)))
+                    f.write('\n')
+
+        with self._lock:
+            self._state.setdefault('%s/%s' % (user, repo,), {})[kind] = mark
+            tmp = self._state_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self._state_path)
+
+    def _load(self, user, repo, kind):
+        path = os.path.join(self._path, kind, user, repo + '.jsonl.gz')
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def sync_commits(self, user, repo):
+        """Fetch and store commits newer than the previous sync.
+
+        Returns list of new commits, oldest first.
+        """
+        mark = self._mark(user, repo, 'commits')
+        params = {}
+        seen = set()
+        if mark is not None:
+            params['since'] = mark['date']
+            # 'since' is inclusive, commits at the mark are known.
+            seen = set(mark['shas'])
+
+        commits = []
+        for commit in self._github.paginate('GET',
+                                            '/repos/%s/%s/commits' %
+                                            (user, repo,), **params):
+            if commit['sha'] not in seen:
+                commits.append(commit)
+
+        if not commits:
+            return []
+
+        commits.sort(key=_commit_date)
+        date = _commit_date(commits[-1])
+        shas = [commit['sha'] for commit in commits
+                if _commit_date(commit) == date]
+        if mark is not None and mark['date'] == date:
+            shas += mark['shas']
+
+        self._store(user, repo, 'commits', commits,
+                    {'date': date, 'shas': shas})
+
+        return commits
+
+    def sync_events(self, user, repo):
+        """Fetch and store events newer than the previous sync.
+
+        Returns list of new events, oldest first.
+        """
+        mark = self._mark(user, repo, 'events')
+        last = int(mark['id']) if mark is not None else 0
+
+        events = []
+        # Events are listed newest first, stop at the first known event.
+        # Pages are not fetched ahead, only pages with new events are
+        # requested.
+        for event in self._github.paginate('GET',
+                                           '/repos/%s/%s/events' %
+                                           (user, repo,), ahead=False):
+            if int(event['id']) <= last:
+                break
+            events.append(event)
+
+        if not events:
+            return []
+
+        events.reverse()
+        self._store(user, repo, 'events', events,
+                    {'id': max((event['id'] for event in events),
+                               key=int)})
+
+        return events
+
+    def commits(self, user, repo):
+        """Returns generator of stored commits, oldest first.
+        """
+        return self._load(user, repo, 'commits')
+
+    def events(self, user, repo):
+        """Returns generator of stored events, oldest first.
+        """
+        return self._load(user, repo, 'events')
@@ -27,25 +27,159 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import io
+import uuid
 import pickle
+import threading
+from collections import OrderedDict
 from types import GeneratorType
 
 from luxon.utils.files import joinpath
 from luxon.utils.http import Client as HTTPClient
 from luxon import g
+from luxon.exceptions import Error, NotFoundError
+
+from psychokinetic.utils.workers import prefetch, imap
+from psychokinetic.utils.ratelimit import RateLimit
+from psychokinetic.utils.checksum import (Checksum,
+                                          ChecksumReader,
+                                          expected_md5)
+from psychokinetic.utils.stream import (StreamReader,
+                                        compress,
+                                        decompressor)
+
+
+class _ContentIndex(object):
+    # Bounded index of MD5 hex digest to object path of content uploaded
+    # by this process, per endpoint and tenant, used as source for server
+    # side copies.
+    def __init__(self, size=4096):
+        self._size = size
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope, md5hash):
+        key = (scope, md5hash,)
+        with self._lock:
+            try:
+                self._index.move_to_end(key)
+                return self._index[key]
+            except KeyError:
+                return None
+
+    def add(self, scope, md5hash, path):
+        key = (scope, md5hash,)
+        with self._lock:
+            self._index[key] = path
+            self._index.move_to_end(key)
+            while len(self._index) > self._size:
+                self._index.popitem(last=False)
+
+
+_content_index = _ContentIndex()
+
+# Endpoint url to True or False once server side copy support is known.
+_copy_support = {}
+
+
+def _checksum(content, content_length, prehash=False):
+    # Bytes are already in memory, digest is sent upfront. Streams are
+    # hashed while uploading and verified against the response. When the
+    # digest is required before uploading, seekable files are hashed first.
+    checksum = Checksum()
+    if isinstance(content, bytes):
+        checksum.update(content)
+        return content, checksum.hexdigest(), None
+    elif prehash and hasattr(content, 'seek') and hasattr(content, 'tell'):
+        position = content.tell()
+        for chunk in iter(lambda: content.read(65536), b''):
+            checksum.update(chunk)
+        content.seek(position)
+        return content, checksum.hexdigest(), None
+    elif hasattr(content, 'read'):
+        content = ChecksumReader(content, checksum, length=content_length)
+        return content, None, checksum
+    elif isinstance(content, GeneratorType):
+        return checksum.iterate(content), None, checksum
+
+    return content, None, None
 
 
 class ObjectStore(object):
+    def _copy(self, target, headers, **kwargs):
+        try:
+            return self.execute('PUT', target,
+                                data=b'',
+                                headers=headers,
+                                content_length=0,
+                                **kwargs)
+        except Error:
+            return None
+
+    def _dedupe(self, md5hash, scope, source, target, headers=None,
+                **kwargs):
+        # Returns response when content is already stored at target, or
+        # could be copied server side from identical content uploaded
+        # before. Returns None when content needs to be uploaded.
+        try:
+            response = self.execute('HEAD', target, **kwargs)
+            if expected_md5(response.headers) == md5hash:
+                return response
+        except NotFoundError:
+            pass
+
+        endpoint = scope[0]
+        copy_from = _content_index.get(scope, md5hash)
+        if (copy_from is None or copy_from == source or
+                _copy_support.get(endpoint) is False):
+            return None
+
+        # Body of copy is empty, its checksum does not apply.
+        headers = {header: value for header, value in (headers or {}).items()
+                   if header != 'X-MD5Hash'}
+        headers['X-Copy-From'] = copy_from
+
+        if endpoint not in _copy_support:
+            # Servers without copy support store an empty object, probe
+            # on a temporary object to never replace the target.
+            probe = target + '.copy-' + uuid.uuid4().hex
+            response = self._copy(probe, headers, **kwargs)
+            if response is None:
+                return None
+            _copy_support[endpoint] = (expected_md5(response.headers) ==
+                                       md5hash)
+            try:
+                self.execute('DELETE', probe, **kwargs)
+            except Error:
+                pass
+            if not _copy_support[endpoint]:
+                return None
+
+        response = self._copy(target, headers, **kwargs)
+        if (response is not None and
+                expected_md5(response.headers) == md5hash):
+            return response
+
+        return None
+
     def _put_object(self, url, path,
                     file_object,
                     content_length,
                     content_type='text/plain; charset=utf-8',
                     md5hash=None,
-                    timestamp=None):
+                    timestamp=None,
+                    verify=True,
+                    dedupe=False):
 
         if content_length is None:
             raise ValueError('Require content_length')
 
+        checksum = None
+        if md5hash is None and (verify or dedupe):
+            file_object, md5hash, checksum = _checksum(file_object,
+                                                       content_length,
+                                                       prehash=dedupe)
+
         headers = {}
         if md5hash is not None:
             headers['X-MD5Hash'] = md5hash
@@ -53,18 +187,37 @@ class ObjectStore(object):
         if timestamp is not None:
             headers['X-Timestamp'] = str(timestamp)
 
-        url = url.rstrip('/') + '/v1/' + path.strip('/')
+        source = path.strip('/')
+        scope = (url, source.split('/', 1)[0],)
+        url = url.rstrip('/') + '/v1/' + source
+
+        if dedupe and md5hash is not None:
+            response = self._dedupe(md5hash, scope, source, url, headers)
+            if response is not None:
+                return response
+
+        response = self.execute('PUT',
+                                url,
+                                data=file_object,
+                                headers=headers,
+                                content_length=content_length,
+                                content_type=content_type)
 
-        return self.execute('PUT',
-                            url,
-                            data=file_object,
-                            headers=headers,
-                            content_length=content_length,
-                            content_type=content_type)
+        if checksum is not None:
+            checksum.verify(expected_md5(response.headers))
+            md5hash = checksum.hexdigest()
 
-    def _get_object(self, url, path):
+        if md5hash is not None:
+            _content_index.add(scope, md5hash, source)
+
+        return response
+
+    def _get_object(self, url, path, verify=True):
         url = url.rstrip('/') + '/v1/' + path.strip('/')
-        return self.stream('GET', url)
+        sr = self.stream('GET', url)
+        if verify:
+            return ChecksumReader(sr, verify_headers=True)
+        return sr
 
     def _unlink_object(self, url, path, timestamp):
         url = url.rstrip('/') + '/v1/' + path.strip('/')
@@ -90,7 +243,31 @@ class ObjectStore(object):
                    content_length=None,
                    content_type=None,
                    etag=None,
-                   raw=False):
+                   raw=False,
+                   verify=True,
+                   codec=None,
+                   dedupe=False):
+        """Put object.
+
+        Args:
+            tenant_id (str): Tenant ID.
+            container (str): Name of container.
+            name (str): Name of object.
+            content (obj): Object to pickle, or when raw bytes, str or
+                file-like object.
+            content_length (int): Required for raw file-like objects.
+            content_type (str): Content type for raw file-like objects.
+            etag (str): Only replace object with matching ETag. (optional)
+            raw (bool): Content is not pickled. Defaults to False.
+            verify (bool): Send and verify checksum. Defaults to True.
+            codec (str): Compress using 'gzip', 'bz2' or 'xz'. (optional)
+            dedupe (bool): Skip upload when the stored object has the same
+                checksum, or copy server side from identical content
+                uploaded before. Seekable files are hashed before
+                uploading. Defaults to False.
+
+        Returns response.
+        """
 
         if raw is False:
             content = pickle.dumps(content)
@@ -100,7 +277,7 @@ class ObjectStore(object):
             if isinstance(content, bytes):
                 content_length = len(content)
             elif isinstance(content, str):
-                content = content.decode('utf-8')
+                content = content.encode('utf-8')
                 content_length = len(content)
                 content_type = "text/plain; charset=utf-8"
 
@@ -113,28 +290,101 @@ class ObjectStore(object):
         if etag is not None:
             headers['If-Match'] = etag
 
-        return self.execute('PUT',
-                            path,
-                            data=content,
-                            headers=headers,
-                            content_length=content_length,
-                            content_type=content_type,
-                            endpoint='katalog')
+        if codec is not None:
+            if not isinstance(content, bytes):
+                raise ValueError('Codec requires bytes content')
+            content = compress(content, codec)
+            content_length = len(content)
+            headers['Content-Encoding'] = codec
+
+        checksum = md5hash = None
+        if verify or dedupe:
+            content, md5hash, checksum = _checksum(content, content_length,
+                                                   prehash=dedupe)
+            if md5hash is not None:
+                headers['X-MD5Hash'] = md5hash
+
+        source = joinpath(tenant_id, container, name)
+        scope = (self.endpoints.get('katalog'), tenant_id,)
+
+        if dedupe and md5hash is not None:
+            response = self._dedupe(md5hash, scope, source, path, headers,
+                                    endpoint='katalog')
+            if response is not None:
+                return response
+
+        response = self.execute('PUT',
+                                path,
+                                data=content,
+                                headers=headers,
+                                content_length=content_length,
+                                content_type=content_type,
+                                endpoint='katalog')
+
+        if checksum is not None:
+            checksum.verify(expected_md5(response.headers))
+            md5hash = checksum.hexdigest()
+
+        if md5hash is not None:
+            _content_index.add(scope, md5hash, source)
+
+        return response
 
     def get_object(self,
                    tenant_id,
                    container,
-                   obj):
+                   obj,
+                   verify=True,
+                   buffer_size=65536):
+        """Get object.
+
+        Pickled objects are decoded directly from the response stream, while
+        decompressing when the object has a Content-Encoding. Other objects
+        are returned as a file-like StreamReader, which iterates in chunks.
+
+        Args:
+            tenant_id (str): Tenant ID.
+            container (str): Name of container.
+            obj (str): Name of object.
+            verify (bool): Verify checksum. Defaults to True.
+            buffer_size (int): Read buffer size. Defaults to 64KB.
+
+        Returns unpickled object or StreamReader.
+        """
         path = joinpath("/v1", tenant_id, container, obj)
         sr = self.stream('GET', path, endpoint='katalog')
         sr.open()
-        if sr.headers['Content-Type'].lower() == 'application/python-pickle':
-            data = pickle.loads(sr.read())
-            sr.close()
-            return data
+        headers = sr.headers
+        codec = headers.get('Content-Encoding')
+
+        if verify:
+            raw = ChecksumReader(sr, expected=expected_md5(headers))
         else:
-            return sr
-        
+            raw = sr
+
+        reader = StreamReader(raw, headers, buffer_size, close=sr.close)
+        pickled = (headers['Content-Type'].lower() ==
+                   'application/python-pickle')
+        if codec is None and not pickled:
+            # Returned as is, buffering it would close the stream when the
+            # buffer is garbage collected.
+            return reader
+
+        decoded = decompressor(io.BufferedReader(reader, buffer_size), codec)
+
+        if pickled:
+            try:
+                data = pickle.load(decoded)
+                # Drain to end of stream, completing checksum verification.
+                for chunk in iter(lambda: decoded.read(buffer_size), b''):
+                    pass
+            finally:
+                reader.close()
+            return data
+
+        return StreamReader(decoded, headers, buffer_size,
+                            close=reader.close)
+
     def unlink_object(self,
                       tenant_id,
                       container,
@@ -150,16 +400,223 @@ class ObjectStore(object):
         path = joinpath("/v1", tenant_id, container, obj)
         return self.execute('HEAD', path, endpoint='katalog')
 
+    def _list_pages(self, path, marker=None, limit=1000,
+                    prefix=None, delimiter=None):
+        params = {}
+        if prefix is not None:
+            params['prefix'] = prefix
+        if delimiter is not None:
+            params['delimiter'] = delimiter
+
+        while True:
+            if marker is not None:
+                params['marker'] = marker
+
+            response = self.execute('GET', path, params=params.copy(),
+                                    limit=limit, endpoint='katalog')
+            page = response.json
+            if isinstance(page, dict):
+                page = page.get('payload', [])
+
+            if not page:
+                return
+
+            yield page
+
+            if len(page) < limit:
+                return
+
+            last = page[-1]
+            if isinstance(last, dict):
+                marker = last.get('name', last.get('subdir'))
+            else:
+                marker = last
+
+    def _list(self, path, marker=None, limit=1000,
+              prefix=None, delimiter=None, background=True):
+        pages = self._list_pages(path, marker, limit, prefix, delimiter)
+        if background:
+            pages = prefetch(pages)
+
+        for page in pages:
+            yield from page
+
     def list_objects(self,
                      tenant_id,
-                     container):
+                     container,
+                     **kwargs):
         path = joinpath("/v1", tenant_id, container)
-        return self.execute('GET', path, endpoint='katalog')
+        return self.execute('GET', path, endpoint='katalog', params=kwargs)
 
     def list_containers(self,
-                        tenant_id):
+                        tenant_id,
+                        **kwargs):
+        path = joinpath("/v1", tenant_id)
+        return self.execute('GET', path, endpoint='katalog', params=kwargs)
+
+    def list_tenant_containers(self, **kwargs):
+        return self.execute('GET', '/v1', endpoint='katalog', params=kwargs)
+
+    def iter_objects(self,
+                     tenant_id,
+                     container,
+                     prefix=None,
+                     delimiter=None,
+                     marker=None,
+                     limit=1000,
+                     background=True):
+        """Iterate over objects in container.
+
+        Pages are requested using marker/limit pagination, while the next
+        page is fetched in the background. Only two pages are held in
+        memory at any time, regardless of the size of the container.
+
+        Args:
+            tenant_id (str): Tenant ID.
+            container (str): Name of container.
+            prefix (str): Only objects with names starting with prefix.
+                (optional)
+            delimiter (str): Roll up names sharing a prefix up to the
+                delimiter into 'subdir' entries. (optional)
+            marker (str): Start listing after this name. (optional)
+            limit (int): Objects per page. Defaults to 1000.
+            background (bool): Prefetch the next page while consuming the
+                current. Defaults to True.
+
+        Returns generator of objects.
+        """
+        path = joinpath("/v1", tenant_id, container)
+        return self._list(path, marker, limit, prefix, delimiter,
+                          background)
+
+    def iter_containers(self,
+                        tenant_id,
+                        prefix=None,
+                        marker=None,
+                        limit=1000,
+                        background=True):
+        """Iterate over containers of tenant.
+
+        Refer to iter_objects for arguments.
+
+        Returns generator of containers.
+        """
         path = joinpath("/v1", tenant_id)
-        return self.execute('GET', path, endpoint='katalog')
+        return self._list(path, marker, limit, prefix, None,
+                          background)
+
+    def iter_tenant_containers(self,
+                               prefix=None,
+                               marker=None,
+                               limit=1000,
+                               background=True):
+        """Iterate over all tenant containers.
+
+        Refer to iter_objects for arguments.
+
+        Returns generator of containers.
+        """
+        return self._list('/v1', marker, limit, prefix, None,
+                          background)
+
+    def _bulk(self, call, specs, workers=8, rate=None):
+        limiter = RateLimit(rate, burst=workers) if rate else None
+
+        def run(spec):
+            if limiter is not None:
+                limiter.wait()
+            return call(spec)
+
+        for spec, future in imap(run, specs, workers, ordered=False):
+            if isinstance(spec, dict):
+                name = spec['name']
+            elif isinstance(spec, (tuple, list,)):
+                name = spec[0]
+            else:
+                name = spec
+
+            error = future.exception()
+            if error is None:
+                response = future.result()
+                status = getattr(response, 'status_code', None)
+            else:
+                response = None
+                status = getattr(error, 'status', None)
+
+            yield {'name': name,
+                   'status': status,
+                   'response': response,
+                   'error': error}
+
+    def bulk_put_objects(self,
+                         tenant_id,
+                         container,
+                         objects,
+                         workers=8,
+                         rate=None,
+                         raw=False):
+        """Put many objects concurrently.
+
+        Args:
+            tenant_id (str): Tenant ID.
+            container (str): Name of container.
+            objects (iterable): (name, content) tuples or dicts with 'name',
+                'content' and optionally any other put_object keyword
+                arguments.
+            workers (int): Maximum concurrent requests. Defaults to 8.
+            rate (float): Maximum requests per second. (optional)
+            raw (bool): Default raw value for put_object. Defaults to False.
+
+        Returns generator of dicts with 'name', 'status', 'response' and
+        'error' for each object as it completes.
+        """
+        def put(spec):
+            if isinstance(spec, dict):
+                kwargs = spec.copy()
+            else:
+                kwargs = {'name': spec[0], 'content': spec[1]}
+            kwargs.setdefault('raw', raw)
+            return self.put_object(tenant_id, container, **kwargs)
+
+        return self._bulk(put, objects, workers, rate)
+
+    def bulk_unlink_objects(self,
+                            tenant_id,
+                            container,
+                            objects,
+                            workers=8,
+                            rate=None):
+        """Delete many objects concurrently.
+
+        Args:
+            tenant_id (str): Tenant ID.
+            container (str): Name of container.
+            objects (iterable): Object names.
+            workers (int): Maximum concurrent requests. Defaults to 8.
+            rate (float): Maximum requests per second. (optional)
+
+        Returns generator of dicts with 'name', 'status', 'response' and
+        'error' for each object as it completes.
+        """
+        def unlink(obj):
+            return self.unlink_object(tenant_id, container, obj)
+
+        return self._bulk(unlink, objects, workers, rate)
+
+    def bulk_object_metadata(self,
+                             tenant_id,
+                             container,
+                             objects,
+                             workers=8,
+                             rate=None):
+        """Retrieve metadata of many objects concurrently.
+
+        Refer to bulk_unlink_objects for arguments.
+
+        Returns generator of dicts with 'name', 'status', 'response' and
+        'error' for each object as it completes.
+        """
+        def metadata(obj):
+            return self.object_metadata(tenant_id, container, obj)
 
-    def list_tenant_containers(self):
-        return self.execute('GET', '/v1', endpoint='katalog')
+        return self._bulk(metadata, objects, workers, rate)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import json
+import mimetypes
+
+from luxon.utils.files import joinpath
+
+from psychokinetic.utils.workers import imap
+from psychokinetic.utils.checksum import Checksum, expected_md5
+
+MANIFEST = '.katalog-manifest.json'
+
+
+def _md5(path):
+    checksum = Checksum()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class Sync(object):
+    """Incremental sync of local directory into container.
+
+    Local files are compared by size and mtime against a manifest kept from
+    the previous run, only files that changed are hashed. Without manifest
+    the container is listed once and compared by size and checksum.
+    Differences are uploaded and deleted concurrently.
+
+    Args:
+        client (obj): psychokinetic.Client obj.
+        tenant_id (str): Tenant ID.
+        container (str): Name of container.
+        path (str): Local directory to mirror.
+        url (str): Katalog URL. Defaults to client 'katalog' endpoint.
+            (optional)
+        manifest (str): Path of manifest file. Defaults to
+            '.katalog-manifest.json' in local directory. (optional)
+        workers (int): Maximum concurrent requests. Defaults to 8.
+
+    Example usage:
+
+    .. code:: python
+
+        sync = Sync(api, tenant_id, 'backups', '/var/backups')
+        for result in sync.run():
+            if result['error']:
+                print(result['name'], result['error'])
+    """
+    def __init__(self, client, tenant_id, container, path,
+                 url=None, manifest=None, workers=8):
+        self._client = client
+        self._tenant_id = tenant_id
+        self._container = container
+        self._path = os.path.abspath(path)
+        self._url = url or client.endpoints['katalog']
+        self._manifest_path = manifest or os.path.join(self._path, MANIFEST)
+        self._workers = workers
+        self._manifest = self._load()
+
+    def _load(self):
+        try:
+            with open(self._manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (manifest.get('tenant_id') != self._tenant_id or
+                manifest.get('container') != self._container):
+            return None
+
+        return manifest['objects']
+
+    def _save(self, objects):
+        manifest = {'tenant_id': self._tenant_id,
+                    'container': self._container,
+                    'objects': objects}
+        tmp = self._manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path)
+
+    def _object_path(self, name):
+        return joinpath(self._tenant_id, self._container, name)
+
+    def local(self):
+        """Returns dict of local files with 'size' and 'mtime'.
+        """
+        files = {}
+        manifest = os.path.abspath(self._manifest_path)
+        for root, dirs, names in os.walk(self._path):
+            for name in names:
+                path = os.path.join(root, name)
+                if path in (manifest, manifest + '.tmp',):
+                    continue
+                stat = os.stat(path)
+                rel = os.path.relpath(path, self._path)
+                files[rel.replace(os.sep, '/')] = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime
+                }
+        return files
+
+    def remote(self):
+        """Returns dict of objects in container with 'size' and 'hash'.
+
+        Uses the manifest when available, otherwise lists the container.
+        """
+        if self._manifest is not None:
+            return self._manifest
+
+        objects = {}
+        for obj in self._client.iter_objects(self._tenant_id,
+                                             self._container):
+            if 'name' not in obj:
+                continue
+            objects[obj['name']] = {
+                'size': obj.get('bytes', obj.get('size')),
+                'mtime': None,
+                'hash': obj.get('hash', obj.get('md5'))
+            }
+        return objects
+
+    def _remote_hashes(self, names):
+        # Checksums of objects, requested concurrently. Objects that could
+        # not be checked are None, so they are uploaded again.
+        hashes = {}
+        for result in self._client.bulk_object_metadata(self._tenant_id,
+                                                        self._container,
+                                                        names,
+                                                        self._workers):
+            if result['error'] is None:
+                hashes[result['name']] = expected_md5(
+                    result['response'].headers)
+            else:
+                hashes[result['name']] = None
+        return hashes
+
+    def diff(self):
+        """Compare local directory to container.
+
+        Returns tuple of (objects, uploads, deletes). objects is the
+        resulting manifest when all changes are applied, uploads and
+        deletes lists of names.
+        """
+        local = self.local()
+        remote = self.remote()
+
+        objects = {}
+        uploads = []
+        unknown = []
+        for name, stat in local.items():
+            known = remote.get(name)
+            if (known is not None and
+                    known['size'] == stat['size'] and
+                    known['mtime'] == stat['mtime']):
+                objects[name] = known
+                continue
+
+            stat['hash'] = _md5(os.path.join(self._path, name))
+            objects[name] = stat
+
+            if known is None or known['size'] != stat['size']:
+                uploads.append(name)
+                continue
+
+            if known['hash'] is None and self._manifest is None:
+                # Listing without checksum, checked in bulk below.
+                unknown.append(name)
+            elif known['hash'] != stat['hash']:
+                uploads.append(name)
+
+        if unknown:
+            hashes = self._remote_hashes(unknown)
+            for name in unknown:
+                if hashes.get(name) != objects[name]['hash']:
+                    uploads.append(name)
+
+        deletes = [name for name in remote if name not in local]
+
+        return (objects, uploads, deletes,)
+
+    def _upload(self, name, md5hash=None):
+        # With the checksum from diff, the file is not hashed again.
+        path = os.path.join(self._path, name)
+        stat = os.stat(path)
+        content_type = (mimetypes.guess_type(name)[0] or
+                        'application/octet-stream')
+        with open(path, 'rb') as f:
+            return self._client._put_object(self._url,
+                                            self._object_path(name),
+                                            f,
+                                            stat.st_size,
+                                            content_type=content_type,
+                                            md5hash=md5hash,
+                                            timestamp=stat.st_mtime)
+
+    def _unlink(self, name):
+        return self._client._unlink_object(self._url,
+                                           self._object_path(name),
+                                           None)
+
+    def run(self):
+        """Upload and delete differences.
+
+        The manifest is saved once done. Changes that failed or were not
+        applied are left out so they are retried on the next run.
+
+        Returns generator of dicts with 'name', 'action', 'response' and
+        'error' for each change as it completes.
+        """
+        objects, uploads, deletes = self.diff()
+        pending = set(uploads) | set(deletes)
+        changes = ([('upload', name,) for name in uploads] +
+                   [('delete', name,) for name in deletes])
+
+        def apply(change):
+            action, name = change
+            if action == 'upload':
+                return self._upload(name, objects[name]['hash'])
+            return self._unlink(name)
+
+        try:
+            for change, future in imap(apply, changes, self._workers,
+                                       ordered=False):
+                action, name = change
+                error = future.exception()
+                if error is None:
+                    pending.discard(name)
+                yield {'name': name,
+                       'action': action,
+                       'response': None if error else future.result(),
+                       'error': error}
+        finally:
+            manifest = {}
+            for name, stat in objects.items():
+                if name not in pending:
+                    manifest[name] = stat
+            for name in deletes:
+                if name in pending:
+                    manifest[name] = {'size': None,
+                                      'mtime': None,
+                                      'hash': None}
+            self._manifest = manifest
+            self._save(manifest)
@@ -0,0 +1,622 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import asyncio
+
+from luxon import constants as const
+from luxon.exceptions import (Error,
+                              NotFoundError,
+                              TokenExpiredError)
+
+from psychokinetic.openstack.api.identityv3 import (_password_auth,
+                                                    _project,
+                                                    _token_scope,
+                                                    _scoped)
+from psychokinetic.openstack.api import networkv2
+from psychokinetic.openstack.api import imagev2
+from psychokinetic.openstack.openstack import _replayable
+from psychokinetic.utils.endpoints import Endpoints
+
+
+def _aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("Asyncio clients require 'aiohttp'" +
+                          " (pip install psychokinetic[aio])") from None
+    return aiohttp
+
+
+class Response(object):
+    """Response of asyncio clients, with body already read.
+
+    Args:
+        status_code (int): HTTP status code.
+        headers (dict): Case insensitive response headers.
+        content (bytes): Response body.
+    """
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    @property
+    def json(self):
+        if not self.content:
+            return None
+        return json.loads(self.text)
+
+
+def _raise_for_status(method, url, response):
+    if response.status_code < 400:
+        return
+
+    if response.status_code == 401:
+        raise TokenExpiredError()
+
+    message = "%s %s failed with status %s" % (method, url,
+                                               response.status_code,)
+    if response.status_code == 404:
+        error = NotFoundError(message)
+    else:
+        error = Error(message)
+    error.status = response.status_code
+    error.response = response
+    raise error
+
+
+class AsyncAPIBase(object):
+    """AsyncAPIBase object.
+
+    Asyncio Openstack Endpoint Classes inherits this Base class. Concurrent
+    requests to the service are limited by a semaphore.
+
+    Args:
+        client (obj): AsyncOpenstack obj.
+        type (str): Openstack Endpoint Type, ie network or image.
+        concurrency (int): Maximum concurrent requests. Defaults to 64.
+    """
+    def __init__(self, client, type, concurrency=64):
+        self._client = client
+        self._type = type
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @property
+    def client(self):
+        """The AsyncOpenstack obj passed for init.
+        """
+        return self._client
+
+    @property
+    def endpoint(self):
+        """Returns catalog url for the given Region, interface and endpoint.
+        """
+        try:
+            return self._client._urls[self._type]
+        except KeyError:
+            raise ValueError("No '%s' endpoint found" % self._type) from None
+
+    async def discover(self, url):
+        """Returns versioned url for the catalog url.
+
+        Args:
+            url (str): Catalog url.
+        """
+        return url
+
+    async def get_url(self):
+        """Returns url for the given Region, interface and endpoint.
+
+        Discovered urls are cached on the client per service type and
+        catalog url, until the scope changes. Concurrent tasks wait for the
+        same discovery.
+        """
+        _url = self.endpoint
+        _key = (self._type, _url,)
+        _discovered = self._client._discovered
+
+        async def _discover():
+            async with self._semaphore:
+                return await self.discover(_url)
+
+        def _forget(future):
+            # Failed or cancelled discoveries are retried by the next call.
+            if future.cancelled() or future.exception() is not None:
+                if _discovered.get(_key) is future:
+                    del _discovered[_key]
+
+        try:
+            future = _discovered[_key]
+        except KeyError:
+            future = _discovered[_key] = asyncio.ensure_future(_discover())
+            future.add_done_callback(_forget)
+
+        # Cancelling a waiting task must not cancel the shared discovery.
+        return await asyncio.shield(future)
+
+    async def execute(self, method, uri='', **kwargs):
+        """Executes the call on the given URI.
+
+        Ags:
+            method (str): String Method to use for API call.
+            uri (str): URI to call.
+            kwargs (kwargs): Additional keyword arguments
+
+        Returns:
+            Response object.
+        """
+        uri = await self.get_url() + '/' + uri
+        async with self._semaphore:
+            return await self.client.execute(method, uri, **kwargs)
+
+
+class AsyncIdentityV3(AsyncAPIBase):
+
+    def _token_url(self):
+        return self.client.keystone_url.rstrip('/') + '/auth/tokens'
+
+    async def authenticate(self, username, password, domain):
+        """Authenticates against Keystone.
+
+        Args:
+            username (str): Username.
+            password (str): Password.
+            domain (str):  Domain.
+        """
+        # Kept to re-authenticate transparently when tokens expire.
+        self.client._credentials = (username, password, domain,)
+
+        _login = _password_auth(username, password, domain)
+        _response = await self.client.execute('POST', self._token_url(),
+                                              data=_login)
+
+        self.client._login_token = self.client['X-Auth-Token'] = \
+            _response.headers['x-subject-token']
+
+        return _response
+
+    async def scope(self, domain=None, project_id=None, project_name=None):
+        """Changes scope on Openstack Identity
+
+        Args:
+            Either specify the project ID or Name. Domain is only required
+            in the case of Project Name, domain is not required for Project
+            ID.
+        """
+        _scope_project = _project(domain, project_id, project_name)
+        if domain:
+            self.client['domain_header'] = domain
+
+        self.client._scope_args = {'domain': domain,
+                                   'project_id': project_id,
+                                   'project_name': project_name}
+
+        _login = _token_scope(self.client._login_token, _scope_project)
+        _response = await self.client.execute('POST', self._token_url(),
+                                              data=_login)
+        _scoped(self.client, _response)
+
+        return _response
+
+    async def reauthenticate(self):
+        """Authenticate and scope again.
+
+        Returns True when credentials were available.
+        """
+        if self.client._credentials is None:
+            return False
+
+        _scope_args = self.client._scope_args
+        await self.authenticate(*self.client._credentials)
+        if _scope_args is not None:
+            await self.scope(**_scope_args)
+
+        return True
+
+    def unscope(self):
+        """Unscope everything and go back to when we just had unscoped
+        authentication.
+        """
+        self.client['X-Auth-Token'] = self.client._login_token
+        self.client._scoped_token = None
+        self.client._scope_args = None
+        self.client._expires = None
+        self.client._catalog = Endpoints()
+        self.client._scope_changed()
+        for header in ('project_id_header', 'domain_header',):
+            if header in self.client:
+                del self.client[header]
+
+    async def revoke(self, token):
+        """Revokes token
+
+        Args:
+            token (str): Token to revoke.
+        """
+        return await self.client.execute('DELETE', self._token_url(),
+                                         headers={'X-Subject-Token': token})
+
+
+class AsyncNetworkV2(AsyncAPIBase):
+
+    async def discover(self, url):
+        """Returns versioned url discovered from the service root.
+        """
+        response = await self.client.execute('GET', url)
+        return networkv2._versioned(url, response.json)
+
+
+class AsyncImageV2(AsyncAPIBase):
+
+    async def discover(self, url):
+        """Returns versioned url discovered from the service root.
+        """
+        response = await self.client.execute('GET', url)
+        return imagev2._versioned(url, response.json)
+
+
+class AsyncOpenstack(object):
+    """Asyncio Restclient to use on Openstack Implementation.
+
+    Same as psychokinetic.openstack.Openstack, but every call is a
+    coroutine. All services share one non-blocking connection pool, while
+    each service limits its concurrent requests, so one event loop can
+    drive many requests in flight.
+
+    Requires the optional 'aiohttp' package, ie the 'aio' extra.
+
+    Args:
+        keystone_url(str): URL of Keystone API.
+        region(str): Region of this Openstack implementation.
+        interface(str): Which openstack interface to use - 'public', 'internal'
+                        or 'admin'.
+        concurrency(int): Maximum concurrent requests per service.
+                          Defaults to 64.
+        connections(int): Maximum connections of the pool shared by all
+                          services. Defaults to 256.
+        timeout(tuple): (connect timeout, read timeout) in seconds.
+                        Defaults to (2, 8).
+        verify(bool): Verify server TLS certificate. Defaults to True.
+
+    Example usage:
+
+    .. code:: python
+
+        async with AsyncOpenstack('http://example:5000/v3') as os:
+            await os.identity.authenticate('admin','password','default')
+            await os.identity.scope(project_name="Customer1",
+                                    domain="default")
+            ports = (await os.network.execute('GET', 'ports')).json
+
+    Requests failing with an expired token are retried once after
+    authenticating and scoping again with the same credentials. Requests
+    streaming a body are not retried.
+    """
+    def __init__(self, keystone_url,
+                 region='RegionOne',
+                 interface='public',
+                 concurrency=64,
+                 connections=256,
+                 timeout=(2, 8),
+                 verify=True):
+        self.keystone_url = keystone_url
+        self._headers = {'Content-Type': const.APPLICATION_JSON}
+
+        self._concurrency = concurrency
+        self._connections = connections
+        self._timeout = timeout
+        self._verify = verify
+        self._session = None
+
+        self._login_token = None
+        self._scoped_token = None
+        self._credentials = None
+        self._scope_args = None
+        self._expires = None
+        self._reauth_lock = None
+
+        self._catalog = Endpoints()
+        self._discovered = {}
+        self._urls = {}
+        self._services = {}
+
+        self._interface = interface
+        self._region = region
+
+    def __setitem__(self, header, value):
+        self._headers[header] = value
+
+    def __getitem__(self, header):
+        return self._headers[header]
+
+    def __delitem__(self, header):
+        del self._headers[header]
+
+    def __contains__(self, header):
+        return header in self._headers
+
+    @property
+    def interface(self):
+        return self._interface
+
+    @interface.setter
+    def interface(self, value):
+        self._interface = value
+        self._update_urls()
+
+    @property
+    def region(self):
+        return self._region
+
+    @region.setter
+    def region(self, value):
+        self._region = value
+        self._update_urls()
+
+    @property
+    def regions(self):
+        """Regions found in the catalog of the scoped token.
+        """
+        return list(self._catalog.regions)
+
+    def _update_urls(self):
+        _urls = {}
+        for type, interfaces in self._catalog.endpoints.items():
+            try:
+                _urls[type] = interfaces[self._interface][self._region]
+            except KeyError:
+                pass
+        self._urls = _urls
+
+    def _scope_changed(self):
+        # Services are kept, their semaphores may have requests waiting.
+        self._discovered = {}
+        self._update_urls()
+
+    @property
+    def session(self):
+        """Connection pool shared by all services and clients.
+        """
+        if self._session is None:
+            aiohttp = _aiohttp()
+            connect, read = self._timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._connections,
+                    ssl=None if self._verify else False),
+                timeout=aiohttp.ClientTimeout(connect=connect,
+                                              sock_read=read))
+        return self._session
+
+    async def request(self, method, url, params=None, data=None,
+                      headers=None):
+        """Send request using the shared connection pool.
+
+        Args:
+            method (str): HTTP Method.
+            url (str): Absolute URL.
+            params (dict): Query parameters. (optional)
+            data (obj): Dict or list sent as JSON, otherwise sent as is.
+                (optional)
+            headers (dict): Request headers. (optional)
+
+        Returns:
+            Response object.
+        """
+        if isinstance(data, (dict, list,)):
+            data = json.dumps(data)
+
+        async with self.session.request(method, url, params=params,
+                                        data=data,
+                                        headers=headers) as response:
+            result = Response(response.status, response.headers,
+                              await response.read())
+
+        _raise_for_status(method, url, result)
+        return result
+
+    async def execute(self, method, url, params=None, data=None,
+                      headers=None):
+        """Execute request with the headers of the client.
+
+        Args:
+            method (str): HTTP Method.
+            url (str): Absolute URL.
+            params (dict): Query parameters. (optional)
+            data (obj): Dict or list sent as JSON, otherwise sent as is.
+                (optional)
+            headers (dict): Additional request headers. (optional)
+
+        Returns:
+            Response object.
+        """
+        def _headers():
+            _headers = self._headers.copy()
+            _headers.update(headers or {})
+            return _headers
+
+        _token = self._current_token()
+        try:
+            return await self.request(method, url, params, data, _headers())
+        except TokenExpiredError:
+            # Token requests handle their own failures.
+            if url.startswith(self.keystone_url.rstrip('/') + '/auth/tokens'):
+                raise
+            if self._reauth_lock is None:
+                self._reauth_lock = asyncio.Lock()
+            async with self._reauth_lock:
+                # Another task may have re-authenticated already.
+                if _token == self._current_token():
+                    if not await self.identity.reauthenticate():
+                        raise
+            # Streamed bodies are consumed, the caller has to send again.
+            if not _replayable(data):
+                raise
+            return await self.request(method, url, params, data, _headers())
+
+    def _current_token(self):
+        return self._headers.get('X-Auth-Token')
+
+    async def close(self):
+        """Close connection pool.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _service(self, type, api):
+        try:
+            return self._services[type]
+        except KeyError:
+            service = self._services[type] = api(self, type,
+                                                 self._concurrency)
+            return service
+
+    @property
+    def identity(self):
+        return self._service('identity', AsyncIdentityV3)
+
+    @property
+    def compute(self):
+        return self._service('compute', AsyncAPIBase)
+
+    @property
+    def orchestration(self):
+        return self._service('orchestration', AsyncAPIBase)
+
+    @property
+    def network(self):
+        return self._service('network', AsyncNetworkV2)
+
+    @property
+    def volume(self):
+        return self._service('volume', AsyncAPIBase)
+
+    @property
+    def volumev2(self):
+        return self._service('volumev2', AsyncAPIBase)
+
+    @property
+    def volumev3(self):
+        return self._service('volumev3', AsyncAPIBase)
+
+    @property
+    def image(self):
+        return self._service('image', AsyncImageV2)
+
+    @property
+    def object_store(self):
+        return self._service('object-store', AsyncAPIBase)
+
+    @property
+    def workloads(self):
+        return self._service('workloads', AsyncAPIBase)
+
+    @property
+    def s3(self):
+        return self._service('s3', AsyncAPIBase)
+
+    @property
+    def cloudformation(self):
+        return self._service('cloudformation', AsyncAPIBase)
+
+    @property
+    def metering(self):
+        return self._service('metering', AsyncAPIBase)
+
+
+class AsyncContrail(object):
+    """Asyncio Restclient to use on Contrail Implementation.
+
+    Provide AsyncOpenstack obj to be used for login Authentication and/or
+    scope change, and simply execute. The connection pool of the
+    AsyncOpenstack obj is shared.
+
+    Args:
+        openstack(obj): AsyncOpenstack obj.
+        url(str): URL of Contrail API.
+        concurrency(int): Maximum concurrent requests. Defaults to 64.
+
+    Example usage:
+
+    .. code:: python
+
+        os = AsyncOpenstack(keystone_url='http://example:5000/v3')
+        ct = AsyncContrail(os, 'http://contrail-url:8082')
+        await ct.authenticate('admin','password','default')
+        await ct.scope(project_name="Customer1", domain="default")
+        vns = (await ct.execute('GET','virtual-networks')).json
+    """
+    def __init__(self, openstack, url, concurrency=64):
+        self._os_token = None
+        self.os = openstack
+        self.url = url
+        self._headers = {'Content-Type': const.APPLICATION_JSON}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def __setitem__(self, header, value):
+        self._headers[header] = value
+
+    def __getitem__(self, header):
+        return self._headers[header]
+
+    def __delitem__(self, header):
+        del self._headers[header]
+
+    def __contains__(self, header):
+        return header in self._headers
+
+    async def authenticate(self, user, passwd, domain=None):
+        await self.os.identity.authenticate(user, passwd, domain)
+        self._os_token = self['X-Auth-Token'] = self.os._login_token
+
+    async def scope(self, domain=None, project_id=None, project_name=None):
+        await self.os.identity.scope(domain=domain, project_id=project_id,
+                                     project_name=project_name)
+        self._os_token = self['X-Auth-Token'] = self.os._scoped_token
+
+    async def execute(self, method, uri, params=None, data=None,
+                      headers=None):
+        uri = self.url + '/' + uri.lstrip('/')
+        _headers = self._headers.copy()
+        _headers.update(headers or {})
+        async with self._semaphore:
+            return await self.os.request(method, uri, params, data,
+                                         _headers)
@@ -27,6 +27,9 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+from urllib.parse import urljoin
+
+from psychokinetic.utils.workers import prefetch
 
 
 class APIBase(object):
@@ -50,19 +53,45 @@ class APIBase(object):
         """
         return self._client
 
+    @property
+    def endpoint(self):
+        """Returns catalog url for the given Region, interface and endpoint.
+        """
+        try:
+            return self._client._urls[self._type]
+        except KeyError:
+            raise ValueError("No '%s' endpoint found" % self._type) from None
+
+    def discover(self, url):
+        """Returns versioned url for the catalog url.
+
+        Services with unversioned catalog endpoints override this to
+        discover the url of the API version from the service root.
+        By default the catalog url is used as is.
+
+        Args:
+            url (str): Catalog url.
+        """
+        return url
+
     @property
     def url(self):
         """Returns url for the given Region, interface and endpoint.
-        """
-        if self._client.interface == 'internal':
-            _ep_interface = '_user_endpoints'
-        else:
-            _ep_interface = '_%s_endpoints' % self._client.interface
 
-        if self._type in getattr(self._client, _ep_interface):
-            return getattr(self._client, _ep_interface)[self._type]
+        Discovered urls are cached on the client per service type and
+        catalog url, until the scope changes.
+        """
+        _url = self.endpoint
+        _key = (self._type, _url,)
+        _discovered = getattr(self._client, '_discovered', None)
+        if _discovered is None:
+            return self.discover(_url)
 
-        raise ValueError("No '%s' endpoint found" % self._type)
+        try:
+            return _discovered[_key]
+        except KeyError:
+            _discovered[_key] = self.discover(_url)
+            return _discovered[_key]
 
     def execute(self, method, uri='', **kwargs):
         """Executes the call on the given URI.
@@ -77,3 +106,86 @@ class APIBase(object):
         """
         uri = self.url + '/' + uri
         return self.client.execute(method, uri, **kwargs)
+
+    def _next(self, url, body, resource):
+        # Neutron, Nova and Cinder.
+        for link in body.get(resource + '_links') or ():
+            if link.get('rel') == 'next':
+                return urljoin(url, link['href'])
+
+        # Keystone.
+        links = body.get('links')
+        if isinstance(links, dict) and links.get('next'):
+            return urljoin(url, links['next'])
+
+        # Glance, path from the service root which may not be the root
+        # of the catalog url. Only the query changes.
+        _next = body.get('next')
+        if isinstance(_next, str):
+            if '?' not in _next:
+                return None
+            return url.split('?', 1)[0] + '?' + _next.split('?', 1)[1]
+
+        return None
+
+    def _linked(self, body, resource):
+        # Services returning links omit 'next' on the last page.
+        return (resource + '_links' in body or
+                'links' in body or
+                'first' in body)
+
+    def _pages(self, uri, resource, limit=None, **params):
+        url = self.url + '/' + uri
+        if limit is not None:
+            params['limit'] = limit
+
+        while True:
+            response = self.client.execute('GET', url, params=params.copy())
+            body = response.json
+            page = body.get(resource) or []
+
+            if not page:
+                return
+
+            yield page
+
+            _next = self._next(url, body, resource)
+            if _next is not None:
+                # Next links include the query.
+                url = _next
+                params = {}
+            elif (limit is not None and len(page) >= limit and
+                  not self._linked(body, resource)):
+                # Service without links, only supports marker and limit.
+                params['marker'] = page[-1]['id']
+            else:
+                return
+
+    def paginate(self, uri, resource=None, limit=None, background=True,
+                 **params):
+        """Iterate over all resources of a list call, page by page.
+
+        Follows the 'next' links returned by the service, or uses the id of
+        the last resource as 'marker' for the following page when the
+        service returns none.
+
+        Args:
+            uri (str): URI of list call, ie 'ports' or 'images'.
+            resource (str): Key of list in response body. Defaults to last
+                segment of uri.
+            limit (int): Resources per page. Defaults to limit of service.
+            background (bool): Fetch next page in background while iterating
+                over current page. Defaults to True.
+            params (kwargs): Additional query parameters, ie filters.
+
+        Returns generator of resources.
+        """
+        if resource is None:
+            resource = uri.rstrip('/').rsplit('/', 1)[-1].replace('-', '_')
+
+        pages = self._pages(uri, resource, limit, **params)
+        if background:
+            pages = prefetch(pages)
+
+        for page in pages:
+            yield from page
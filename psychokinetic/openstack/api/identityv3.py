@@ -27,31 +27,132 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import hmac
 import json
+import hashlib
 
 from psychokinetic.openstack.api.apibase import APIBase
-from luxon.exceptions import FieldMissing
+from psychokinetic.openstack.tokencache import expires
+from psychokinetic.utils.endpoints import Endpoints
+from luxon.exceptions import FieldMissing, TokenExpiredError
+
+
+class _CachedToken(object):
+    # Token response served from token cache.
+    status_code = 201
+
+    def __init__(self, cached):
+        self.headers = {'x-subject-token': cached['token']}
+        self.json = cached['body']
+
+
+def _index(catalog):
+    # Index every endpoint of the token catalog by type, interface and
+    # region.
+    _endpoints = Endpoints()
+    for c in catalog:
+        for e in c['endpoints']:
+            if e['interface'] in Endpoints.interfaces:
+                _endpoints.set(c['type'], e['interface'],
+                               e['region'], e['url'])
+    return _endpoints
+
+
+def _password_auth(username, password, domain):
+    # Unscoped password authentication request body.
+    _password = {
+        'user': {'name': username, 'domain': {'name': domain},
+                 'password': password}}
+    _identity = {'methods': ['password'], 'password': _password}
+    _auth = {'identity': _identity, 'scope': 'unscoped'}
+    return {'auth': _auth}
+
+
+def _project(domain=None, project_id=None, project_name=None):
+    # Project of scope, either by ID or by name within domain.
+    _project = {}
+
+    if domain:
+        _project['domain'] = {'name': domain}
+    if project_id:
+        _project['id'] = project_id
+    elif project_name:
+        if not domain:
+            raise FieldMissing('domain', 'domain',
+                               'Scoping requires domain with Project Name')
+        _project['name'] = project_name
+    else:
+        raise FieldMissing('project_id or project_name', 'Project',
+                           'Scoping requires either Project ID or Name')
+
+    return _project
+
+
+def _token_scope(login_token, project):
+    # Request body scoping the login token to project.
+    _identity = {'methods': ['token'],
+                 'token': {'id': login_token}}
+    _scope = {'project': project}
+    _auth = {'identity': _identity, 'scope': _scope}
+    return {'auth': _auth}
+
+
+def _scoped(client, response):
+    # Apply scoped token response to client.
+    client._scoped_token = client['X-Auth-Token'] = \
+        response.headers['x-subject-token']
+    client['project_id_header'] = response.json['token']['project']['id']
+    client._expires = expires(response.json)
+    client._catalog = _index(response.json['token']['catalog'])
+    client._scope_changed()
 
 
 class IdentityV3(APIBase):
 
+    def _token_key(self, project=None):
+        if self.client._credentials is None:
+            return None
+        _username, _password, _domain = self.client._credentials
+        # Cached tokens are only found with the same password, without it
+        # any password would return a token.
+        _secret = hmac.new(_password.encode('utf-8'),
+                           json.dumps([self.client.keystone_url, _username,
+                                       _domain]).encode('utf-8'),
+                           hashlib.sha256).hexdigest()
+        return (self.client.keystone_url, _username, _domain, _secret,
+                project,)
+
+    def _scope_key(self, domain=None, project_id=None, project_name=None):
+        return self._token_key(project_id or
+                               '%s/%s' % (domain, project_name,))
+
     def authenticate(self, username, password, domain):
         """Authenticates against Keystone.
 
+        When the client has a token cache, a valid cached token is reused
+        instead of requesting a new token.
+
         Args:
             username (str): Username.
             password (str): Password.
             domain (str):  Domain.
         """
-        _token_url = self.client.keystone_url.rstrip('/') + '/auth/tokens'
-        _password = {
-            'user': {'name': username, 'domain': {'name': domain},
-                     'password': password}}
-        _identity = {'methods': ['password'], 'password': _password}
-        _auth = {'identity': _identity, 'scope': 'unscoped'}
-        _login = {'auth': _auth}
+        # Kept to re-authenticate transparently when tokens expire.
+        self.client._credentials = (username, password, domain,)
+        _cache = self.client._token_cache
+        _key = self._token_key()
+
+        _cached = _cache.get(_key) if _cache is not None else None
+        if _cached is not None:
+            _response = _CachedToken(_cached)
+        else:
+            _token_url = self.client.keystone_url.rstrip('/') + '/auth/tokens'
+            _login = _password_auth(username, password, domain)
 
-        _response = self.client.execute('POST', _token_url, data=_login)
+            _response = self.client.execute('POST', _token_url, data=_login)
+            if _cache is not None:
+                _cache.set(_key, _response.headers['x-subject-token'],
+                           _response.json)
 
         self.client._login_token = self.client['X-Auth-Token'] = \
         _response.headers['x-subject-token']
@@ -61,6 +162,9 @@ class IdentityV3(APIBase):
     def scope(self, domain=None, project_id=None, project_name=None):
         """Changes scope on Openstack Identity
 
+        When the client has a token cache, a valid cached scoped token and
+        its catalog are reused instead of requesting a new token.
+
         Args:
             Either specify the project ID or Name. Domain is only required
             in the case of Project Name, domain is not required for Project
@@ -68,47 +172,88 @@ class IdentityV3(APIBase):
 
         """
         _token_url = self.client.keystone_url.rstrip('/') + '/auth/tokens'
-        _identity = {'methods': ['token'],
-                     'token': {'id': self.client._login_token}}
-        _project = {}
-
+        _scope_project = _project(domain, project_id, project_name)
         if domain:
-            _project['domain'] = {'name': domain}
             self.client['domain_header'] = domain
-        if project_id:
-             _project['id'] = project_id
-        elif project_name:
-            if not domain:
-                raise FieldMissing('domain', 'domain',
-                                   'Scoping requires domain with Project Name')
-            _project['name'] = project_name
 
+        self.client._scope_args = {'domain': domain,
+                                   'project_id': project_id,
+                                   'project_name': project_name}
+
+        _cache = self.client._token_cache
+        _key = self._scope_key(domain, project_id, project_name)
+        if _key is None:
+            _cache = None
+
+        _cached = _cache.get(_key) if _cache is not None else None
+
+        if _cached is not None:
+            _response = _CachedToken(_cached)
         else:
-            raise FieldMissing('project_id or project_name', 'Project',
-                               'Scoping requires either Project ID or Name')
+            def _scope():
+                _login = json.dumps(_token_scope(self.client._login_token,
+                                                 _scope_project))
+
+                return self.client.execute('POST', _token_url, data=_login)
+
+            try:
+                _response = _scope()
+            except TokenExpiredError:
+                # Cached login token expired or revoked.
+                if _cache is None:
+                    raise
+                _cache.delete(self._token_key())
+                self.authenticate(*self.client._credentials)
+                _response = _scope()
+
+            if _cache is not None:
+                _cache.set(_key, _response.headers['x-subject-token'],
+                           _response.json)
+
+        _scoped(self.client, _response)
 
-        _scope = {'project': _project}
-        _auth = {'identity': _identity, 'scope': _scope}
-        _login = json.dumps({'auth': _auth})
+        return _response
+
+    def reauthenticate(self):
+        """Authenticate and scope again, ignoring cached tokens.
+
+        Returns True when credentials were available.
+        """
+        if self.client._credentials is None:
+            return False
+
+        _cache = self.client._token_cache
+        _scope_args = self.client._scope_args
+        if _cache is not None:
+            _cache.delete(self._token_key())
+            if _scope_args is not None:
+                _cache.delete(self._scope_key(**_scope_args))
 
-        _response = self.client.execute('POST', _token_url, data=_login)
+        self.authenticate(*self.client._credentials)
+        if _scope_args is not None:
+            self.scope(**_scope_args)
+
+        return True
+
+    def rescope(self):
+        """Scope again with the login token, ignoring cached tokens.
+
+        Used to renew the scoped token before it expires.
+
+        Returns True when the client was scoped.
+        """
+        _scope_args = self.client._scope_args
+        if _scope_args is None:
+            return False
 
-        _catalog = _response.json['token']['catalog']
-        self.client._scoped_token = self.client['X-Auth-Token'] = \
-            _response.headers['x-subject-token']
-        self.client['project_id_header'] = _response.json['token']['project'][
-            'id']
+        _cache = self.client._token_cache
+        _key = self._scope_key(**_scope_args)
+        if _cache is not None and _key is not None:
+            _cache.delete(_key)
 
-        for c in _catalog:
-            for e in c['endpoints']:
-                if e['region'] == self.client.region:
-                    if e['interface'] == 'internal':
-                        self.client._user_endpoints[c['type']] = e['url']
-                    elif e['interface'] == 'public':
-                        self.client._public_endpoints[c['type']] = e['url']
-                    elif e['interface'] == 'admin':
-                        self.client._admin_endpoints[c['type']] = e['url']
+        self.scope(**_scope_args)
 
+        return True
 
     def unscope(self):
         """Unscope everything and go back to when we just had unscoped
@@ -116,9 +261,10 @@ class IdentityV3(APIBase):
         """
         self.client['X-Auth-Token'] = self.client._login_token
         self.client._scoped_token = None
-        self.client._user_endpoints = {}
-        self.client._public_endpoints = {}
-        self.client._admin_endpoints = {}
+        self.client._scope_args = None
+        self.client._expires = None
+        self.client._catalog = Endpoints()
+        self.client._scope_changed()
         try:
             del self.client['project_id_header']
         except:
@@ -27,21 +27,150 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import os
+
 from psychokinetic.openstack.api.apibase import APIBase
+from psychokinetic.utils.checksum import Checksum
+
+
+def _length(data):
+    # Total length of data when known.
+    if isinstance(data, (bytes, bytearray,)):
+        return len(data)
+    try:
+        position = data.tell()
+        end = data.seek(0, os.SEEK_END)
+        data.seek(position)
+        return end - position
+    except Exception:
+        return None
+
+
+def _chunks(data, chunk_size):
+    if isinstance(data, (bytes, bytearray,)):
+        for offset in range(0, len(data), chunk_size):
+            yield bytes(data[offset:offset + chunk_size])
+    elif hasattr(data, 'read'):
+        yield from iter(lambda: data.read(chunk_size), b'')
+    else:
+        yield from data
+
+
+def _versioned(url, versions):
+    # Versioned url from the version document of the service root.
+    for value in versions['versions']:
+        if value['status'] == 'CURRENT':
+            links = value['links']
+            for link in links:
+                if link['rel'] == 'self':
+                    return link['href']
+    raise ValueError("No 'v2.0' link found for %s" % url)
 
 
 class ImageV2(APIBase):
 
-    @property
-    def url(self):
-        """Returns url for the given Region, interface and endpoint.
+    def discover(self, url):
+        """Returns versioned url discovered from the service root.
+        """
+        return _versioned(url, self.client.execute('GET', url).json)
+
+    def upload(self, image_id, data, progress=None, chunk_size=65536):
+        """Upload image data as a stream.
+
+        Data is sent with chunked transfer encoding while the MD5 checksum
+        is computed, so only one chunk is in memory at a time. Once
+        uploaded the checksum is verified against the checksum of the
+        image.
+
+        Args:
+            image_id (str): Image ID.
+            data (str/obj): Path of file, file object, bytes or iterable of
+                bytes chunks.
+            progress (callable): Called with bytes sent and total bytes,
+                total being None when unknown. (optional)
+            chunk_size (int): Bytes per chunk. Defaults to 65536.
+
+        Raises:
+            ChecksumError on mismatch.
+
+        Returns image.
+        """
+        if isinstance(data, str):
+            with open(data, 'rb') as file_object:
+                return self.upload(image_id, file_object, progress,
+                                   chunk_size)
+
+        checksum = Checksum()
+        total = _length(data)
+
+        def body():
+            for chunk in checksum.iterate(_chunks(data, chunk_size)):
+                yield chunk
+                if progress is not None:
+                    progress(checksum.length, total)
+
+        self.execute('PUT', 'images/%s/file' % image_id, data=body(),
+                     headers={'Content-Type': 'application/octet-stream'})
+
+        image = self.execute('GET', 'images/%s' % image_id).json
+        checksum.verify(image.get('checksum'))
+
+        return image
+
+    def download(self, image_id, file_or_path, progress=None,
+                 chunk_size=65536):
+        """Download image data as a stream.
+
+        Data is written as it is received while the MD5 checksum is
+        computed, and verified against the Content-MD5 header or checksum
+        of the image.
+
+        Args:
+            image_id (str): Image ID.
+            file_or_path (str/obj): Path of file or file object to write.
+            progress (callable): Called with bytes received and total bytes,
+                total being None when unknown. (optional)
+            chunk_size (int): Bytes per chunk. Defaults to 65536.
+
+        Raises:
+            ChecksumError on mismatch. Partially written files at path are
+            removed.
+
+        Returns MD5 hex digest of data.
         """
-        _url = super().url
-        versions = super().client.execute('GET',_url).json
-        for value in versions['versions']:
-            if value['status'] == 'CURRENT':
-                links = value['links']
-                for link in links:
-                    if link['rel'] == 'self':
-                        return link['href']
-        raise ValueError("No 'v2.0' link found for %s" % _url)
+        if isinstance(file_or_path, str):
+            try:
+                with open(file_or_path, 'wb') as file_object:
+                    return self.download(image_id, file_object, progress,
+                                         chunk_size)
+            except BaseException:
+                try:
+                    os.remove(file_or_path)
+                except OSError:
+                    pass
+                raise
+
+        checksum = Checksum()
+        response = self.client.stream('GET', self.url.rstrip('/') +
+                                      '/images/%s/file' % image_id)
+        try:
+            response.open()
+            headers = response.headers or {}
+            expected = headers.get('Content-MD5')
+            total = headers.get('Content-Length')
+            total = int(total) if total is not None else None
+
+            for chunk in checksum.iterate(_chunks(response, chunk_size)):
+                file_or_path.write(chunk)
+                if progress is not None:
+                    progress(checksum.length, total)
+        finally:
+            response.close()
+
+        if expected is None:
+            expected = self.execute('GET',
+                                    'images/%s' % image_id).json.get(
+                                        'checksum')
+        checksum.verify(expected)
+
+        return checksum.hexdigest()
@@ -27,21 +27,162 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import time
+
+from luxon.exceptions import NotFoundError
+
 from psychokinetic.openstack.api.apibase import APIBase
+from psychokinetic.utils.workers import imap, chunks, status_of
+
+
+def _plural(resource):
+    # Collection of resource, ie 'policy' to 'policies'.
+    if resource.endswith('y'):
+        return resource[:-1] + 'ies'
+    return resource + 's'
+
+
+def _rejected(error):
+    # Request was refused before being processed, so nothing was created.
+    # Timeouts, connection and server errors are ambiguous.
+    status = status_of(error)
+    return status is not None and 400 <= status < 500
+
+
+def _retry(func, retries, transient=None):
+    # Retry with backoff on transient failures, by default any failure
+    # other than client errors.
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except NotFoundError:
+            raise
+        except Exception as error:
+            if transient is None:
+                retry = not _rejected(error)
+            else:
+                retry = status_of(error) in transient
+            if attempt >= retries or not retry:
+                raise
+        time.sleep(0.5 * 2 ** attempt)
+        attempt += 1
+
+
+def _versioned(url, versions):
+    # Versioned url from the version document of the service root.
+    for value in versions['versions']:
+        if value['id'] == 'v2.0':
+            links = value['links']
+            for link in links:
+                if link['rel'] == 'self':
+                    return link['href']
+    raise ValueError("No 'v2.0' link found for %s" % url)
+
+
+# Create requests are only retried when refused without being processed.
+_CREATE_RETRY = (429, 503,)
 
 
 class NetworkV2(APIBase):
 
-    @property
-    def url(self):
-        """Returns url for the given Region, interface and endpoint.
+    def discover(self, url):
+        """Returns versioned url discovered from the service root.
+        """
+        return _versioned(url, self.client.execute('GET', url).json)
+
+    def bulk_create(self, resource, items, chunk_size=100, workers=4,
+                    retries=2):
+        """Create many resources with bulk requests.
+
+        Items are posted in chunks of chunk_size per request, with chunks
+        posted concurrently. Neutron creates a chunk all or nothing, when a
+        chunk is rejected with a client error its items are created one at
+        a time, so only the failing items are reported with errors.
+
+        Creates are not repeated when the outcome is unknown, such as on
+        timeouts, connection or server errors, since Neutron may have
+        created the resources. The error is reported for every item of the
+        chunk instead.
+
+        Args:
+            resource (str): Resource, ie 'network', 'subnet' or 'port'.
+            items (iterable): Dicts of resource attributes.
+            chunk_size (int): Items per request. Defaults to 100.
+            workers (int): Maximum concurrent requests. Defaults to 4.
+            retries (int): Retries of requests refused with status 429 or
+                503. Defaults to 2.
+
+        Returns generator of dicts with 'item', 'result' being the created
+        resource and 'error' for each item as chunks complete.
         """
-        _url = super().url
-        versions = super().client.execute('GET',_url).json
-        for value in versions['versions']:
-            if value['id'] == 'v2.0':
-                links = value['links']
-                for link in links:
-                    if link['rel'] == 'self':
-                        return link['href']
-        raise ValueError("No 'v2.0' link found for %s" % _url)
+        collection = _plural(resource)
+        uri = collection.replace('_', '-')
+
+        def create(item):
+            return _retry(lambda: self.execute(
+                'POST', uri, data={resource: item}).json[resource], retries,
+                _CREATE_RETRY)
+
+        def create_chunk(chunk):
+            try:
+                created = _retry(lambda: self.execute(
+                    'POST', uri, data={collection: chunk}).json[collection],
+                    retries, _CREATE_RETRY)
+                return [(item, result, None,)
+                        for item, result in zip(chunk, created)]
+            except Exception as error:
+                # Chunk may have been created, creating items again could
+                # duplicate them.
+                if len(chunk) == 1 or not _rejected(error):
+                    raise
+
+            results = []
+            for item in chunk:
+                try:
+                    results.append((item, create(item), None,))
+                except Exception as error:
+                    results.append((item, None, error,))
+            return results
+
+        for chunk, future in imap(create_chunk,
+                                  chunks(items, chunk_size),
+                                  workers, ordered=False):
+            error = future.exception()
+            if error is not None:
+                results = [(item, None, error,) for item in chunk]
+            else:
+                results = future.result()
+
+            for item, result, error in results:
+                yield {'item': item,
+                       'result': result,
+                       'error': error}
+
+    def bulk_delete(self, resource, ids, workers=8, retries=2):
+        """Delete many resources concurrently.
+
+        Resources already deleted are not reported as errors.
+
+        Args:
+            resource (str): Resource, ie 'network', 'subnet' or 'port'.
+            ids (iterable): IDs of resources.
+            workers (int): Maximum concurrent requests. Defaults to 8.
+            retries (int): Retries of requests failing other than with
+                client errors. Defaults to 2.
+
+        Returns generator of dicts with 'id' and 'error' for each resource
+        as it completes.
+        """
+        uri = _plural(resource).replace('_', '-')
+
+        def delete(id):
+            try:
+                _retry(lambda: self.execute('DELETE', uri + '/' + id),
+                       retries)
+            except NotFoundError:
+                pass
+
+        for id, future in imap(delete, ids, workers, ordered=False):
+            yield {'id': id,
+                   'error': future.exception()}
@@ -27,8 +27,50 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import time
+import threading
+from collections import OrderedDict
+
 from luxon.utils.http import Client
 
+from psychokinetic.utils.workers import imap, chunks
+
+
+class _FQNameCache(object):
+    # Bounded cache of (resource, fq_name) to UUID, with entries expiring
+    # after ttl seconds.
+    def __init__(self, ttl=300, size=65536):
+        self._ttl = ttl
+        self._size = size
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, resource, fq_name):
+        key = (resource, tuple(fq_name),)
+        with self._lock:
+            try:
+                uuid, expires = self._index[key]
+            except KeyError:
+                return None
+            if expires < time.monotonic():
+                del self._index[key]
+                return None
+            self._index.move_to_end(key)
+            return uuid
+
+    def add(self, resource, fq_name, uuid):
+        key = (resource, tuple(fq_name),)
+        with self._lock:
+            self._index[key] = (uuid, time.monotonic() + self._ttl,)
+            self._index.move_to_end(key)
+            while len(self._index) > self._size:
+                self._index.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+
+
 class Contrail(Client):
     """Restclient to use on Contrail Implementation.
 
@@ -38,6 +80,8 @@ class Contrail(Client):
     Args:
         openstack(obj): psychokinetic.Openstac obj.
         url(str): URL of Contrail API.
+        ttl(int): Seconds fq_name to UUID lookups are cached.
+                  Defaults to 300.
 
     Example usage:
 
@@ -48,14 +92,23 @@ class Contrail(Client):
         ct.authenticate('admin','password','default')
         ct.scope(project_name="Customer1", domain="default")
         vns = ct.execute('GET','virtual-networks').json
+
+    Related objects are read in batches:
+
+    .. code:: python
+
+        vns = ct.list('virtual-network',
+                      fields=['instance_ip_back_refs'])
+        iips = ct.read_refs(vns, 'instance_ip_back_refs')
     """
 
-    def __init__(self, openstack, url):
+    def __init__(self, openstack, url, ttl=300):
         super().__init__()
 
         self._os_token = None
         self.os = openstack
         self.url = url
+        self._fq_names = _FQNameCache(ttl)
 
     def authenticate(self, user, passwd, domain=None):
         self.os.identity.authenticate(user, passwd, domain)
@@ -71,3 +124,108 @@ class Contrail(Client):
     def execute(self, method, uri, **kwargs):
         uri = self.url + '/' + uri.lstrip('/')
         return super().execute(method, uri, **kwargs)
+
+    def list(self, resource, detail=True, fields=None, obj_uuids=None,
+             chunk_size=100, workers=4, **params):
+        """List resources, with many objects per request.
+
+        When obj_uuids are provided, they are requested in chunks of
+        chunk_size UUIDs per request, with chunks requested concurrently.
+        The fq_name to UUID of listed objects are cached.
+
+        Args:
+            resource (str): Resource, ie 'virtual-network'.
+            detail (bool): Return objects with properties and references,
+                instead of only 'fq_name', 'uuid' and 'href'.
+                Defaults to True.
+            fields (list): Additional fields to return, ie back references.
+                (optional)
+            obj_uuids (iterable): Only return objects with these UUIDs.
+                (optional)
+            chunk_size (int): UUIDs per request. Defaults to 100.
+            workers (int): Maximum concurrent requests. Defaults to 4.
+            params (kwargs): Additional filters, ie parent_id or
+                back_ref_id.
+
+        Returns list of objects.
+        """
+        collection = resource + 's'
+        if detail:
+            params['detail'] = 'True'
+        if fields:
+            params['fields'] = ','.join(fields)
+
+        def read(uuids=None):
+            _params = params.copy()
+            if uuids is not None:
+                _params['obj_uuids'] = ','.join(uuids)
+            objects = self.execute('GET', collection,
+                                   params=_params).json[collection]
+            if detail:
+                objects = [obj[resource] for obj in objects]
+            for obj in objects:
+                if 'fq_name' in obj and 'uuid' in obj:
+                    self._fq_names.add(resource, obj['fq_name'],
+                                       obj['uuid'])
+            return objects
+
+        if obj_uuids is None:
+            return read()
+
+        objects = []
+        for uuids, future in imap(read, chunks(obj_uuids, chunk_size),
+                                  workers):
+            objects.extend(future.result())
+        return objects
+
+    def fq_name_to_id(self, resource, fq_name):
+        """Returns UUID of object with fq_name.
+
+        Lookups are cached for ttl seconds, objects returned by list are
+        cached as well.
+
+        Args:
+            resource (str): Resource, ie 'virtual-network'.
+            fq_name (list): Fully qualified name, ie
+                ['default-domain', 'admin', 'net1'].
+        """
+        uuid = self._fq_names.get(resource, fq_name)
+        if uuid is None:
+            uuid = self.execute('POST', 'fqname-to-id',
+                                data={'type': resource,
+                                      'fq_name': list(fq_name)}).json['uuid']
+            self._fq_names.add(resource, fq_name, uuid)
+        return uuid
+
+    def read_refs(self, objects, field, resource=None, fields=None,
+                  **kwargs):
+        """Read objects referred to by field of objects, in batches.
+
+        Args:
+            objects (list): Objects with references, ie from list.
+            field (str): References field, ie 'instance_ip_back_refs' or
+                'virtual_machine_interface_refs'.
+            resource (str): Resource referred to. Defaults to resource
+                derived from field.
+            fields (list): Additional fields to return. (optional)
+            kwargs (kwargs): Additional keyword arguments for list.
+
+        Returns list of referred objects, each object only once.
+        """
+        if resource is None:
+            resource = field
+            for suffix in ('_back_refs', '_refs',):
+                if resource.endswith(suffix):
+                    resource = resource[:-len(suffix)]
+                    break
+            resource = resource.replace('_', '-')
+
+        uuids = OrderedDict()
+        for obj in objects:
+            for ref in obj.get(field) or ():
+                uuids[ref['uuid']] = None
+
+        if not uuids:
+            return []
+
+        return self.list(resource, fields=fields, obj_uuids=uuids, **kwargs)
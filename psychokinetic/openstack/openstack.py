@@ -27,8 +27,11 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import threading
+
 from luxon import constants as const
 from luxon.utils.http import Client
+from luxon.exceptions import TokenExpiredError
 from psychokinetic.openstack.api.identityv3 import IdentityV3
 from psychokinetic.openstack.api.networkv2 import NetworkV2
 from psychokinetic.openstack.api.imagev2 import ImageV2
@@ -42,6 +45,14 @@ from psychokinetic.openstack.api.apibase import APIBase as WorkloadsV1
 from psychokinetic.openstack.api.apibase import APIBase as S3V1
 from psychokinetic.openstack.api.apibase import APIBase as CloudformationV1
 from psychokinetic.openstack.api.apibase import APIBase as MeteringV1
+from psychokinetic.openstack.tokencache import TokenCache
+from psychokinetic.utils.endpoints import Endpoints
+
+
+def _replayable(data):
+    # Request bodies that can be sent again.
+    return data is None or isinstance(data, (bytes, str, dict, list,))
+
 
 class Openstack(Client):
     """Restclient to use on Openstack Implementation.
@@ -54,6 +65,9 @@ class Openstack(Client):
         region(str): Region of this Openstack implementation.
         interface(str): Which openstack interface to use - 'public', 'internal'
                         or 'admin'.
+        token_cache(obj): TokenCache to reuse tokens across clients and
+                          processes on the host, or True for the default
+                          TokenCache. (optional)
 
     Example usage:
 
@@ -64,10 +78,23 @@ class Openstack(Client):
         os.identity.scope(project_name="Customer1", domain="default")
         projects = os.identity.execute('GET','tenants').json
 
+    Changing the region or interface of a scoped client selects other
+    endpoints from the catalog, without calling Keystone again:
+
+    .. code:: python
+
+        os.region = "RegionTwo"
+
+    Requests failing with an expired token are retried once after
+    authenticating and scoping again with the same credentials. Requests
+    streaming a body from a file or iterator are not retried, they raise
+    TokenExpiredError after authenticating again.
+
     """
     def __init__(self, keystone_url,
                  region='RegionOne',
-                 interface='public'):
+                 interface='public',
+                 token_cache=None):
         # The user should only be able to select interface public or internal.
         # Lower case it as well and lower the ones we get.
 
@@ -87,69 +114,157 @@ class Openstack(Client):
         # environment information.
         self._scoped_token = None
 
-        # Dictionary with key being 'type' ie image, metering, identity,
-        # network, orchestration, volume, volume2, volumev3, etc.
-        # The value being the url. Its not neccessary to store region,
-        # interface, because its selected at Openstack client init.
-        # The identity.scope method will populate these values.
-        self._user_endpoints = {}
-        # We have to fill below ones anyways.
-        self._admin_endpoints = {}
-        self._public_endpoints = {}
+        # Credentials and scope kept by identity to re-authenticate when
+        # tokens expire, and expiry of the scoped token.
+        self._credentials = None
+        self._scope_args = None
+        self._expires = None
+        self._reauth_lock = threading.Lock()
+
+        if token_cache is True:
+            token_cache = TokenCache()
+        self._token_cache = token_cache
+
+        # Full catalog of the scoped token, indexed by 'type' ie image,
+        # metering, identity, network, orchestration, volume, etc., then
+        # interface and region. The identity.scope method populates it.
+        self._catalog = Endpoints()
+
+        # Versioned urls discovered from service roots, keyed by service
+        # type and catalog url. Cleared when the catalog changes.
+        self._discovered = {}
+
+        # Service type to url for the selected interface, precomputed when
+        # the catalog or interface changes.
+        self._urls = {}
+
+        # Service API objects are created once per scope.
+        self._services = {}
+
+        # The following interface, region select the endpoints from the
+        # catalog above. Changing them does not require scoping again.
+        self._interface = interface
+        self._region = region
+
+    @property
+    def interface(self):
+        return self._interface
+
+    @interface.setter
+    def interface(self, value):
+        self._interface = value
+        self._update_urls()
+
+    @property
+    def region(self):
+        return self._region
+
+    @region.setter
+    def region(self, value):
+        self._region = value
+        self._update_urls()
+
+    @property
+    def regions(self):
+        """Regions found in the catalog of the scoped token.
+        """
+        return list(self._catalog.regions)
+
+    def _update_urls(self):
+        _urls = {}
+        for type, interfaces in self._catalog.endpoints.items():
+            try:
+                _urls[type] = interfaces[self._interface][self._region]
+            except KeyError:
+                pass
+        self._urls = _urls
+
+    def _scope_changed(self):
+        # Catalog changed, drop everything derived from it.
+        self._services = {}
+        self._discovered = {}
+        self._update_urls()
+
+    def execute(self, method, url, *args, **kwargs):
+        _token = self._current_token()
+        try:
+            return super().execute(method, url, *args, **kwargs)
+        except TokenExpiredError:
+            # Token requests handle their own failures.
+            if url.startswith(self.keystone_url.rstrip('/') + '/auth/tokens'):
+                raise
+            with self._reauth_lock:
+                # Another thread may have re-authenticated already.
+                if _token == self._current_token():
+                    if not self.identity.reauthenticate():
+                        raise
+            # Streamed bodies are consumed, the caller has to send again.
+            if not _replayable(kwargs.get('data',
+                                          args[1] if len(args) > 1
+                                          else None)):
+                raise
+            return super().execute(method, url, *args, **kwargs)
+
+    def _current_token(self):
+        if 'X-Auth-Token' in self:
+            return self['X-Auth-Token']
+        return None
 
-        # The following interface, region is used to by identity.scope
-        # to determine the endpoints that are stored above in endpoints.
-        self.interface = interface
-        self.region = region
+    def _service(self, type, api):
+        try:
+            return self._services[type]
+        except KeyError:
+            service = self._services[type] = api(self, type)
+            return service
 
     @property
     def identity(self):
-        return IdentityV3(self, 'identity')
+        return self._service('identity', IdentityV3)
 
     @property
     def compute(self):
-        return ComputeV1(self, 'compute')
+        return self._service('compute', ComputeV1)
 
     @property
     def orchestration(self):
-        return OrchestrationV1(self, 'orchestration')
+        return self._service('orchestration', OrchestrationV1)
 
     @property
     def network(self):
-        return NetworkV2(self, 'network')
+        return self._service('network', NetworkV2)
 
     @property
     def volume(self):
-        return VolumeV1(self, 'volume')
+        return self._service('volume', VolumeV1)
 
     @property
     def volumev2(self):
-        return VolumeV2(self, 'volumev2')
+        return self._service('volumev2', VolumeV2)
 
     @property
     def volumev3(self):
-        return VolumeV3(self, 'volumev3')
+        return self._service('volumev3', VolumeV3)
 
     @property
     def image(self):
-        return ImageV2(self, 'image')
+        return self._service('image', ImageV2)
 
     @property
     def object_store(self):
-        return ObjectStoreV1(self, 'object-store')
+        return self._service('object-store', ObjectStoreV1)
 
     @property
     def workloads(self):
-        return WorkloadsV1(self, 'workloads')
+        return self._service('workloads', WorkloadsV1)
 
     @property
     def s3(self):
-        return S3V1(self, 's3')
+        return self._service('s3', S3V1)
 
     @property
     def cloudformation(self):
-        return CloudformationV1(self, 'cloudformation')
+        return self._service('cloudformation', CloudformationV1)
 
     @property
     def metering(self):
-        return MeteringV1(self, 'metering')
+        return self._service('metering', MeteringV1)
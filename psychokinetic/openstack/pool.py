@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import time
+import threading
+
+from luxon import GetLogger
+
+from psychokinetic.openstack.openstack import Openstack
+from psychokinetic.openstack.tokencache import expires
+from psychokinetic.utils.workers import imap
+
+log = GetLogger(__name__)
+
+
+class ScopedPool(object):
+    """Pool of Openstack clients scoped to many projects.
+
+    Authenticates once and shares the login token with one client per
+    project. Clients are scoped concurrently on first use and kept, while a
+    background thread renews login and scoped tokens before they expire.
+
+    Args:
+        keystone_url(str): URL of Keystone API.
+        username (str): Username.
+        password (str): Password.
+        domain (str): Domain of user.
+        region(str): Region of this Openstack implementation.
+        interface(str): Which openstack interface to use - 'public',
+                        'internal' or 'admin'.
+        workers (int): Maximum concurrent operations. Defaults to 8.
+        token_cache(obj): TokenCache to reuse tokens across clients and
+                          processes on the host, or True for the default
+                          TokenCache. (optional)
+        margin (int): Seconds before expiry tokens are renewed.
+            Defaults to 600.
+        interval (int): Seconds between checking for expiring tokens.
+            Defaults to 60.
+
+    Example usage:
+
+    .. code:: python
+
+        pool = ScopedPool('http://example:5000/v3', 'admin', 'password',
+                          'default')
+        for result in pool.map(lambda os: os.network.execute(
+                'GET', 'ports').json, project_ids):
+            print(result['project_id'], result['result'], result['error'])
+        pool.close()
+
+    """
+    def __init__(self, keystone_url, username, password, domain,
+                 region='RegionOne', interface='public', workers=8,
+                 token_cache=None, margin=600, interval=60):
+        self._keystone_url = keystone_url
+        self._region = region
+        self._interface = interface
+        self._workers = workers
+        self._margin = margin
+
+        self._login = Openstack(keystone_url, region=region,
+                                interface=interface,
+                                token_cache=token_cache)
+        self._login_expires = None
+        self._authenticate(username, password, domain)
+
+        self._clients = {}
+        self._lock = threading.Lock()
+
+        self._closed = threading.Event()
+        self._refresher = threading.Thread(target=self._refresh_loop,
+                                           args=(interval,),
+                                           daemon=True)
+        self._refresher.start()
+
+    def _authenticate(self, username, password, domain):
+        response = self._login.identity.authenticate(username, password,
+                                                     domain)
+        self._login_expires = expires(response.json)
+
+    def _scope(self, project_id):
+        client = Openstack(self._keystone_url, region=self._region,
+                           interface=self._interface,
+                           token_cache=self._login._token_cache)
+        # Share the login token, only the scoped token is requested.
+        client._credentials = self._login._credentials
+        client._login_token = client['X-Auth-Token'] = \
+            self._login._login_token
+        client.identity.scope(project_id=project_id)
+        return client
+
+    def client(self, project_id):
+        """Returns Openstack client scoped to project.
+
+        Args:
+            project_id (str): Project ID.
+        """
+        with self._lock:
+            try:
+                return self._clients[project_id]
+            except KeyError:
+                pass
+
+        client = self._scope(project_id)
+        with self._lock:
+            return self._clients.setdefault(project_id, client)
+
+    def scope(self, project_ids):
+        """Scope clients for projects concurrently.
+
+        Args:
+            project_ids (iterable): Project IDs.
+
+        Returns generator of dicts with 'project_id' and 'error'.
+        """
+        for project_id, future in imap(self.client, project_ids,
+                                       workers=self._workers,
+                                       ordered=False):
+            yield {'project_id': project_id,
+                   'error': future.exception()}
+
+    def map(self, func, project_ids, ordered=False):
+        """Run func concurrently with the client of each project.
+
+        Exceptions are not raised, they are returned as 'error' for the
+        project.
+
+        Args:
+            func (callable): Callable receiving the scoped Openstack client.
+            project_ids (iterable): Project IDs.
+            ordered (bool): Yield results in order of project_ids, otherwise
+                as they complete. Defaults to False.
+
+        Returns generator of dicts with 'project_id', 'result' and 'error'.
+        """
+        def _run(project_id):
+            return func(self.client(project_id))
+
+        for project_id, future in imap(_run, project_ids,
+                                       workers=self._workers,
+                                       ordered=ordered):
+            error = future.exception()
+            yield {'project_id': project_id,
+                   'result': future.result() if error is None else None,
+                   'error': error}
+
+    def refresh(self):
+        """Renew login and scoped tokens expiring within margin.
+        """
+        deadline = time.time() + self._margin
+
+        if self._login_expires is not None and \
+                self._login_expires < deadline:
+            # Cached login token is only reused well before expiry.
+            _cache = self._login._token_cache
+            if _cache is not None:
+                _cache.delete(self._login.identity._token_key())
+            self._authenticate(*self._login._credentials)
+
+        with self._lock:
+            clients = list(self._clients.values())
+
+        def _rescope(client):
+            client._login_token = self._login._login_token
+            client.identity.rescope()
+
+        expiring = [client for client in clients
+                    if client._expires is not None and
+                    client._expires < deadline]
+
+        for client, future in imap(_rescope, expiring,
+                                   workers=self._workers,
+                                   ordered=False):
+            error = future.exception()
+            if error is not None:
+                log.warning('Failed renewing token for project %s: %s' %
+                            (client['project_id_header'], error,))
+
+    def _refresh_loop(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning('Failed renewing tokens: %s' % e)
+
+    def close(self):
+        """Stop renewing tokens and release clients.
+        """
+        self._closed.set()
+        self._refresher.join()
+        with self._lock:
+            self._clients = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
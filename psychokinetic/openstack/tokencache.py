@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import json
+import time
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+
+
+def expires(body):
+    """Returns expiry of Keystone token response body as UNIX time.
+    """
+    expires_at = body['token']['expires_at']
+    return datetime.strptime(expires_at[:19],
+                             '%Y-%m-%dT%H:%M:%S').replace(
+                                 tzinfo=timezone.utc).timestamp()
+
+
+class TokenCache(object):
+    """Host wide cache of Keystone tokens.
+
+    Tokens and their response bodies, including the catalog of scoped
+    tokens, are stored as files in a directory only accessible by the
+    current user. All processes of the user on the host share the cache.
+    Tokens are no longer used shortly before they expire.
+
+    Args:
+        path (str): Cache directory. Defaults to directory in the system
+            temporary directory, unique per user. (optional)
+        margin (int): Seconds before expiry tokens are discarded.
+            Defaults to 300.
+    """
+    def __init__(self, path=None, margin=300):
+        if path is None:
+            path = os.path.join(tempfile.gettempdir(),
+                                'psychokinetic-tokens-%s' % os.getuid())
+        self._path = path
+        self._margin = margin
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        if os.stat(path).st_uid != os.getuid():
+            raise PermissionError("Token cache '%s' not owned by user" %
+                                  path)
+        os.chmod(path, 0o700)
+
+    def _file(self, key):
+        key = json.dumps(key).encode('utf-8')
+        return os.path.join(self._path, hashlib.sha256(key).hexdigest())
+
+    def get(self, key):
+        """Returns dict with 'token', 'body' and 'expires' or None.
+
+        Args:
+            key (tuple): (keystone_url, user, domain, project).
+        """
+        try:
+            with open(self._file(key), 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if cached['expires'] - self._margin < time.time():
+            self.delete(key)
+            return None
+
+        return cached
+
+    def set(self, key, token, body):
+        """Store token.
+
+        Args:
+            key (tuple): (keystone_url, user, domain, project).
+            token (str): Token.
+            body (dict): Keystone token response body.
+        """
+        path = self._file(key)
+        tmp = '%s.%s.tmp' % (path, os.getpid(),)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'token': token,
+                       'body': body,
+                       'expires': expires(body)}, f)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import re
+import hashlib
+
+from psychokinetic.exceptions import ChecksumError
+
+_MD5 = re.compile(r'^[0-9a-f]{32}$')
+
+
+def expected_md5(headers):
+    """Returns MD5 hex digest advertised in response headers.
+
+    Checks 'X-MD5Hash' and otherwise the 'ETag' when it is a plain MD5 hex
+    digest. Multipart and weak ETags are ignored.
+
+    Args:
+        headers (dict): Response headers.
+
+    Returns hex digest or None.
+    """
+    if headers is None:
+        return None
+
+    for header in ('X-MD5Hash', 'ETag'):
+        value = headers.get(header)
+        if value:
+            value = value.strip().strip('"').lower()
+            if _MD5.match(value):
+                return value
+
+    return None
+
+
+class Checksum(object):
+    """Incremental checksum of data as it flows.
+
+    Args:
+        algorithm (str): hashlib algorithm name. Defaults to 'md5'.
+    """
+    def __init__(self, algorithm='md5'):
+        self._hash = hashlib.new(algorithm)
+        self.length = 0
+
+    def update(self, data):
+        if data:
+            self._hash.update(data)
+            self.length += len(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def verify(self, expected):
+        """Compare against expected hex digest.
+
+        Args:
+            expected (str): Expected hex digest. If None nothing is verified.
+
+        Raises:
+            ChecksumError on mismatch.
+        """
+        if expected is None:
+            return
+
+        expected = expected.strip().strip('"').lower()
+        computed = self.hexdigest()
+        if expected != computed:
+            raise ChecksumError(expected, computed)
+
+    def iterate(self, iterable):
+        """Returns generator updating checksum with each chunk.
+        """
+        for chunk in iterable:
+            self.update(chunk)
+            yield chunk
+
+
+class ChecksumReader(object):
+    """File-like object updating checksum on every read.
+
+    All other attributes are proxied to the wrapped object, so it can wrap
+    both files and HTTP response streams. When expected digest is provided,
+    its verified once the end of the data is reached.
+
+    Args:
+        file_object (obj): Object with a read method.
+        checksum (Checksum): Checksum to update. (optional)
+        length (int): Length of data, used by HTTP clients to send a
+            Content-Length without chunking. (optional)
+        expected (str): Expected hex digest to verify at end. (optional)
+        verify_headers (bool): Verify against digest advertised in headers
+            of wrapped object, when expected is not provided. This is
+            resolved at the end, so it works for streams opened lazily.
+            (optional)
+    """
+    def __init__(self, file_object, checksum=None, length=None,
+                 expected=None, verify_headers=False):
+        self._file_object = file_object
+        self.checksum = checksum or Checksum()
+        self._length = length
+        self._expected = expected
+        self._verify_headers = verify_headers
+        self._verified = False
+
+    def __getattr__(self, attr):
+        return getattr(self._file_object, attr)
+
+    def __len__(self):
+        if self._length is None:
+            return 0
+        return max(0, self._length - self.checksum.length)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = -1
+            data = self._file_object.read()
+        else:
+            data = self._file_object.read(size)
+        self.checksum.update(data)
+        if not data or size < 0:
+            self.verify()
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+    def verify(self):
+        if not self._verified:
+            self._verified = True
+            expected = self._expected
+            if expected is None and self._verify_headers:
+                expected = expected_md5(
+                    getattr(self._file_object, 'headers', None))
+            self.checksum.verify(expected)
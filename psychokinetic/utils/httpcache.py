@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import time
+import sqlite3
+import threading
+
+
+class HTTPCache(object):
+    """Persistent cache of responses for HTTP conditional requests.
+
+    Keeps the ETag, Last-Modified, selected headers and decoded JSON body of
+    responses in a SQLite database, so the cache survives restarts and can
+    be shared between processes. When more than size entries are stored,
+    the least recently used are evicted.
+
+    Args:
+        path (str): Path of SQLite database file.
+        size (int): Maximum entries. Defaults to 10000.
+    """
+    def __init__(self, path, size=10000):
+        self._size = size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30,
+                                   check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS cache ('
+                             ' key TEXT PRIMARY KEY,'
+                             ' etag TEXT,'
+                             ' modified TEXT,'
+                             ' headers TEXT,'
+                             ' body TEXT,'
+                             ' used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS cache_used'
+                             ' ON cache (used)')
+
+    def get(self, key):
+        """Returns dict with 'etag', 'modified', 'headers' and 'body' or
+        None.
+        """
+        with self._lock, self._db:
+            row = self._db.execute('SELECT etag, modified, headers, body'
+                                   ' FROM cache WHERE key = ?',
+                                   (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE cache SET used = ? WHERE key = ?',
+                             (time.time(), key,))
+
+        return {'etag': row[0],
+                'modified': row[1],
+                'headers': json.loads(row[2]),
+                'body': json.loads(row[3])}
+
+    def set(self, key, etag, modified, headers, body):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO cache'
+                             ' (key, etag, modified, headers, body, used)'
+                             ' VALUES (?, ?, ?, ?, ?, ?)',
+                             (key, etag, modified, json.dumps(headers),
+                              json.dumps(body), time.time(),))
+            count = self._db.execute('SELECT COUNT(*)'
+                                     ' FROM cache').fetchone()[0]
+            if count > self._size:
+                self._db.execute('DELETE FROM cache WHERE key IN ('
+                                 ' SELECT key FROM cache'
+                                 ' ORDER BY used ASC LIMIT ?)',
+                                 (count - self._size,))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM cache')
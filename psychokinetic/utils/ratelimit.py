@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import time
+import heapq
+import threading
+from itertools import count
+
+
+class RateLimit(object):
+    """Thread safe request rate limiter.
+
+    Spaces calls evenly to not exceed rate per second, while allowing a
+    burst of calls after being idle.
+
+    Args:
+        rate (float): Maximum calls per second.
+        burst (int): Calls allowed at once after being idle. (optional)
+    """
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError('Rate limit requires positive rate')
+
+        self._interval = 1.0 / rate
+        self._burst = max(1, burst)
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call is allowed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next,
+                        now - (self._burst - 1) * self._interval)
+            self._next = start + self._interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _Budget(object):
+    # Request budget of one rate limit resource.
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.in_flight = 0
+
+
+class Scheduler(object):
+    """Rate limit aware request scheduler.
+
+    Tracks the request budget advertised in 'X-RateLimit-Limit',
+    'X-RateLimit-Remaining' and 'X-RateLimit-Reset' response headers,
+    separately for each 'X-RateLimit-Resource', ie 'core' and 'graphql'.
+    Concurrency is reduced as a budget runs low, waiting requests start
+    in order of priority, and requests only wait for the reset once their
+    budget is exhausted or the server asked to back off.
+
+    Example usage:
+
+    .. code:: python
+
+        scheduler.acquire(priority=1)
+        try:
+            response = client.execute('GET', url)
+        finally:
+            scheduler.release(response.headers)
+
+    Args:
+        concurrency (int): Maximum concurrent requests. Defaults to 8.
+        low (float): Fraction of the budget below which concurrency is
+            reduced. Defaults to 0.1.
+    """
+    def __init__(self, concurrency=8, low=0.1):
+        self._concurrency = concurrency
+        self._low = low
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = count()
+        self._in_flight = 0
+        self._budgets = {}
+        self._blocked_until = 0
+
+    def _budget(self, resource):
+        try:
+            return self._budgets[resource]
+        except KeyError:
+            budget = self._budgets[resource] = _Budget()
+            return budget
+
+    @property
+    def remaining(self):
+        """Remaining requests of the 'core' budget.
+        """
+        return self._budget('core').remaining
+
+    @property
+    def reset(self):
+        """Reset time of the 'core' budget.
+        """
+        return self._budget('core').reset
+
+    def budget(self, resource='core'):
+        """Returns (limit, remaining, reset) of resource budget.
+
+        Args:
+            resource (str): Rate limit resource. Defaults to 'core'.
+        """
+        budget = self._budget(resource)
+        return (budget.limit, budget.remaining, budget.reset,)
+
+    def _allowed(self, budget):
+        if budget.remaining is None or not budget.limit:
+            return self._concurrency
+
+        low = budget.limit * self._low
+        if budget.remaining >= low:
+            return self._concurrency
+
+        return max(1, int(self._concurrency * budget.remaining / low))
+
+    def _delay(self, now, budget):
+        if self._blocked_until > now:
+            return self._blocked_until - now
+
+        if (budget.remaining is not None and budget.reset is not None and
+                budget.remaining - budget.in_flight <= 0 and
+                budget.reset > now):
+            return budget.reset - now
+
+        return 0
+
+    def _next(self, now):
+        # Highest priority waiting request with budget available, so an
+        # exhausted budget does not hold up requests of other resources.
+        for entry in sorted(self._queue):
+            if self._delay(now, self._budget(entry[2])) <= 0:
+                return entry
+        return None
+
+    def acquire(self, priority=0, resource='core'):
+        """Block until request may start.
+
+        Args:
+            priority (int): Higher priority requests start first.
+                Defaults to 0.
+            resource (str): Rate limit resource of request.
+                Defaults to 'core'.
+        """
+        with self._cond:
+            entry = (-priority, next(self._sequence), resource,)
+            budget = self._budget(resource)
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.time()
+                    if (self._next(now) == entry and
+                            budget.in_flight < self._allowed(budget) and
+                            self._in_flight < self._concurrency):
+                        break
+                    delay = self._delay(now, budget)
+                    self._cond.wait(delay if delay > 0 else None)
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+            budget.in_flight += 1
+            self._in_flight += 1
+
+    def release(self, headers=None, resource='core'):
+        """Request completed.
+
+        Args:
+            headers (dict): Response headers to update budget. (optional)
+            resource (str): Rate limit resource of request.
+                Defaults to 'core'.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._budget(resource).in_flight -= 1
+            if headers is not None:
+                self._update(headers, resource)
+            self._cond.notify_all()
+
+    def _update(self, headers, resource='core'):
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = int(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        budget = self._budget(headers.get('X-RateLimit-Resource') or
+                              resource)
+
+        # Responses complete out of order, within a window the lowest
+        # remaining count is the most recent.
+        if reset != budget.reset or budget.remaining is None:
+            budget.remaining = remaining
+        else:
+            budget.remaining = min(budget.remaining, remaining)
+        budget.limit = limit
+        budget.reset = reset
+
+    def backoff(self, seconds=None, resource='core'):
+        """Pause requests.
+
+        Args:
+            seconds (float): Seconds to pause all requests, otherwise
+                requests of resource until its budget resets. (optional)
+            resource (str): Rate limit resource. Defaults to 'core'.
+        """
+        with self._cond:
+            budget = self._budget(resource)
+            if seconds is None and budget.reset is not None:
+                budget.remaining = 0
+            else:
+                # Without known reset, GitHub advises waiting a minute.
+                seconds = 60 if seconds is None else seconds
+                self._blocked_until = max(self._blocked_until,
+                                          time.time() + seconds)
+            self._cond.notify_all()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import io
+import bz2
+import gzip
+import lzma
+
+CODECS = ('gzip', 'bz2', 'xz',)
+
+
+def compress(data, codec):
+    """Compress bytes using codec.
+
+    Args:
+        data (bytes): Data to compress.
+        codec (str): 'gzip', 'bz2' or 'xz'.
+
+    Returns compressed bytes.
+    """
+    if codec == 'gzip':
+        # Fixed mtime keeps output, and therefore checksums, reproducible.
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as f:
+            f.write(data)
+        return buffer.getvalue()
+    elif codec == 'bz2':
+        return bz2.compress(data)
+    elif codec == 'xz':
+        return lzma.compress(data)
+
+    raise ValueError("Unsupported codec '%s'" % codec)
+
+
+def decompressor(file_object, codec):
+    """Wrap file-like object to decompress while reading.
+
+    Args:
+        file_object (obj): Readable file-like object.
+        codec (str): 'gzip', 'bz2', 'xz' or None / 'identity' for no
+            decompression.
+
+    Returns file-like object.
+    """
+    if codec is None or codec == 'identity':
+        return file_object
+    elif codec in ('gzip', 'x-gzip',):
+        return gzip.GzipFile(fileobj=file_object, mode='rb')
+    elif codec == 'bz2':
+        return bz2.BZ2File(file_object, mode='rb')
+    elif codec in ('xz', 'lzma',):
+        return lzma.LZMAFile(file_object, mode='rb')
+
+    raise ValueError("Unsupported codec '%s'" % codec)
+
+
+class StreamReader(io.RawIOBase):
+    """File-like adapter over HTTP response streams.
+
+    Provides a standard raw IO interface, so it can be buffered with
+    io.BufferedReader and passed to anything expecting a file, such as
+    pickle.load or decompressors. Iterating returns chunks, not lines.
+
+    Args:
+        stream (obj): Object with a read(size) method.
+        headers (dict): Response headers. (optional)
+        chunk_size (int): Size of chunks when iterating. Defaults to 64KB.
+        close (callable): Called on close, for the underlying response when
+            stream is a wrapper. (optional)
+    """
+    def __init__(self, stream, headers=None, chunk_size=65536, close=None):
+        super().__init__()
+        self._stream = stream
+        self.headers = headers
+        self.chunk_size = chunk_size
+        self._close = close or getattr(stream, 'close', None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._stream.read(len(b))
+        length = len(data)
+        b[:length] = data
+        return length
+
+    def iter_chunks(self, chunk_size=None):
+        """Returns generator of chunks until end of stream.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        while True:
+            chunk = self._stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self._close is not None:
+                    self._close()
+            finally:
+                super().close()
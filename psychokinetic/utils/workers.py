@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from collections import deque
+from itertools import islice
+from concurrent.futures import (ThreadPoolExecutor,
+                                wait,
+                                FIRST_COMPLETED)
+
+_END = object()
+
+
+def prefetch(iterable):
+    """Iterate while the next item is fetched in the background.
+
+    While the caller is busy with the current item, the following item is
+    already being produced by a worker thread. Only one item is fetched
+    ahead, so memory stays bounded to two items at a time.
+
+    Args:
+        iterable (iterable): Items to fetch, typically a generator of pages.
+
+    Returns generator of items in original order.
+    """
+    iterator = iter(iterable)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, iterator, _END)
+        while True:
+            item = future.result()
+            if item is _END:
+                return
+            future = executor.submit(next, iterator, _END)
+            yield item
+
+
+def imap(func, iterable, workers=8, ordered=True):
+    """Run func on each item concurrently on a bounded worker pool.
+
+    Items are consumed from iterable lazily, only a couple of items per
+    worker are in flight at any time. Its safe to provide a generator
+    with millions of items.
+
+    Exceptions are not raised, they are kept on the future returned for the
+    item.
+
+    Args:
+        func (callable): Callable receiving one item.
+        iterable (iterable): Items to process.
+        workers (int): Maximum concurrent calls. Defaults to 8.
+        ordered (bool): Yield results in order of items, otherwise as they
+            complete. Defaults to True.
+
+    Returns generator of (item, future) tuples.
+    """
+    iterator = iter(iterable)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            pending = deque()
+
+            def submit(count):
+                for item in islice(iterator, count):
+                    pending.append((item, executor.submit(func, item),))
+
+            submit(workers * 2)
+            while pending:
+                item, future = pending.popleft()
+                wait((future,))
+                submit(1)
+                yield (item, future,)
+        else:
+            pending = {}
+
+            def submit(count):
+                for item in islice(iterator, count):
+                    pending[executor.submit(func, item)] = item
+
+            submit(workers * 2)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    submit(1)
+                    yield (item, future,)
+
+
+def chunks(iterable, size):
+    """Split items into lists of size items.
+
+    Items are consumed from iterable lazily, one chunk at a time.
+
+    Args:
+        iterable (iterable): Items to split.
+        size (int): Items per chunk.
+
+    Returns generator of lists.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def status_of(error):
+    """Returns HTTP status code of error raised by a request.
+
+    Args:
+        error (Exception): Exception with a 'status' or a 'response' with
+            'status_code'.
+
+    Returns int or None when unknown, ie connection errors.
+    """
+    status = getattr(error, 'status', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None),
+                         'status_code', None)
+    try:
+        return int(str(status)[:3])
+    except ValueError:
+        return None
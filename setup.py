@@ -145,6 +145,7 @@ setup_dict = dict(
     dependency_links=dependency_links,
     # Allow tests to be run with `python setup.py test'.
     tests_require=install_requires + tests_requires,
+    extras_require={'aio': ['aiohttp']},
     cmdclass=cmdclass,
     zip_safe=False,  # don't use eggs
     python_requires='>=3.6',
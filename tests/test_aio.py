@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import asyncio
+
+from pytest import raises
+
+from luxon.exceptions import TokenExpiredError
+
+from psychokinetic.openstack.aio import (AsyncOpenstack, Response,
+                                         _raise_for_status)
+
+KEYSTONE = 'http://keystone:5000/v3'
+TOKENS = KEYSTONE + '/auth/tokens'
+NETWORK = 'http://network:9696'
+VERSIONS = b'''{"versions": [{"id": "v2.0", "status": "CURRENT",
+    "links": [{"rel": "self", "href": "http://network:9696/v2.0"}]}]}'''
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def token(project_id):
+    return ('{"token": {"expires_at": "2030-01-01T00:00:00.000000Z",'
+            ' "project": {"id": "%s"},'
+            ' "catalog": [{"type": "network", "endpoints": ['
+            '  {"interface": "public", "region": "RegionOne",'
+            '   "url": "%s"}]}]}}' % (project_id, NETWORK,)).encode()
+
+
+class Keystone(object):
+    # Fake of AsyncOpenstack.request, with Keystone and a network service.
+    def __init__(self):
+        self.sent = []
+        self.tokens = 0
+        self.valid = set()
+        self.discover = None
+        self.fail = 0
+
+    async def request(self, method, url, params=None, data=None,
+                      headers=None):
+        self.sent.append((method, url, data, dict(headers or {}),))
+        if url == TOKENS and method == 'POST':
+            self.tokens += 1
+            subject = 'token%s' % self.tokens
+            self.valid.add(subject)
+            if 'password' in data['auth']['identity']:
+                return Response(201, {'x-subject-token': subject}, b'{}')
+            return Response(201, {'x-subject-token': subject},
+                            token(data['auth']['scope']['project']['id']))
+
+        if url == NETWORK:
+            if self.discover is not None:
+                await self.discover.wait()
+            if self.fail:
+                self.fail -= 1
+                _raise_for_status(method, url, Response(503, {}, b''))
+            return Response(200, {}, VERSIONS)
+
+        response = Response(200, {}, b'[]')
+        if headers.get('X-Auth-Token') not in self.valid:
+            response = Response(401, {}, b'')
+        _raise_for_status(method, url, response)
+        return response
+
+
+def openstack(keystone, **kwargs):
+    os = AsyncOpenstack(KEYSTONE, **kwargs)
+    os.request = keystone.request
+    return os
+
+
+async def scoped(os):
+    await os.identity.authenticate('admin', 'secret', 'default')
+    await os.identity.scope(project_id='p1')
+    return os
+
+
+class TestIdentity(object):
+    def test_authenticate_scope(self):
+        keystone = Keystone()
+        os = run(scoped(openstack(keystone)))
+
+        method, url, data, headers = keystone.sent[0]
+        assert data['auth']['identity']['password']['user'] == {
+            'name': 'admin', 'domain': {'name': 'default'},
+            'password': 'secret'}
+        method, url, data, headers = keystone.sent[1]
+        assert data['auth']['identity']['token'] == {'id': 'token1'}
+        assert data['auth']['scope'] == {'project': {'id': 'p1'}}
+
+        assert os._login_token == 'token1'
+        assert os['X-Auth-Token'] == os._scoped_token == 'token2'
+        assert os['project_id_header'] == 'p1'
+        assert os.regions == ['RegionOne']
+        assert os.network.endpoint == NETWORK
+
+    def test_unscope(self):
+        os = run(scoped(openstack(Keystone())))
+        os.identity.unscope()
+        assert os['X-Auth-Token'] == 'token1'
+        assert 'project_id_header' not in os
+        with raises(ValueError):
+            os.network.endpoint
+
+
+class TestReauthenticate(object):
+    def test_retry(self):
+        keystone = Keystone()
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            keystone.valid.clear()
+            return os, await os.network.execute('GET', 'ports')
+
+        os, response = run(test())
+        assert response.json == []
+        assert os['X-Auth-Token'] == 'token4'
+        gets = [sent for sent in keystone.sent if sent[0] == 'GET' and
+                sent[1] != NETWORK]
+        assert [sent[3]['X-Auth-Token'] for sent in gets] == ['token2',
+                                                              'token4']
+
+    def test_concurrent_retry_authenticates_once(self):
+        keystone = Keystone()
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            await os.network.get_url()
+            keystone.valid.clear()
+            return await asyncio.gather(*[os.network.execute('GET', 'ports')
+                                          for i in range(5)])
+
+        assert len(run(test())) == 5
+        # Two tokens to scope at first, two to authenticate again.
+        assert keystone.tokens == 4
+
+    def test_token_request_not_retried(self):
+        keystone = Keystone()
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            keystone.valid.clear()
+            await os.execute('GET', TOKENS)
+
+        with raises(TokenExpiredError):
+            run(test())
+
+    def test_stream_not_retried(self):
+        keystone = Keystone()
+
+        async def body():
+            yield b'data'
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            keystone.valid.clear()
+            await os.network.execute('PUT', 'file', data=body())
+
+        with raises(TokenExpiredError):
+            run(test())
+        # Authenticated again for the next request.
+        assert keystone.tokens == 4
+
+
+class TestConcurrency(object):
+    def test_semaphore_limit(self):
+        keystone = Keystone()
+        state = {'active': 0, 'most': 0}
+
+        async def test():
+            os = await scoped(openstack(keystone, concurrency=3))
+            await os.network.get_url()
+            request = os.request
+
+            async def limited(*args, **kwargs):
+                state['active'] += 1
+                state['most'] = max(state['most'], state['active'])
+                await asyncio.sleep(0.01)
+                state['active'] -= 1
+                return await request(*args, **kwargs)
+
+            os.request = limited
+            await asyncio.gather(*[os.network.execute('GET', 'ports')
+                                   for i in range(10)])
+
+        run(test())
+        assert state['most'] == 3
+
+
+class TestDiscover(object):
+    def test_cached(self):
+        keystone = Keystone()
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            return await asyncio.gather(*[os.network.get_url()
+                                          for i in range(3)])
+
+        assert run(test()) == [NETWORK + '/v2.0'] * 3
+        assert [sent[1] for sent in keystone.sent].count(NETWORK) == 1
+
+    def test_cancel_one_caller(self):
+        keystone = Keystone()
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            keystone.discover = asyncio.Event()
+            first = asyncio.ensure_future(os.network.execute('GET', 'a'))
+            second = asyncio.ensure_future(os.network.execute('GET', 'b'))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            await asyncio.sleep(0.01)
+            keystone.discover.set()
+            response = await second
+            with raises(asyncio.CancelledError):
+                await first
+            # Later calls use the completed discovery.
+            await os.network.execute('GET', 'c')
+            return response.json
+
+        assert run(test()) == []
+        assert [sent[1] for sent in keystone.sent].count(NETWORK) == 1
+
+    def test_failed_discovery_retried(self):
+        keystone = Keystone()
+        keystone.fail = 1
+
+        async def test():
+            os = await scoped(openstack(keystone))
+            with raises(Exception):
+                await os.network.get_url()
+            return await os.network.get_url()
+
+        assert run(test()) == NETWORK + '/v2.0'
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from urllib.parse import urlencode
+
+from psychokinetic.openstack.api.apibase import APIBase
+
+
+class Response(object):
+    def __init__(self, json):
+        self.json = json
+
+
+class Client(object):
+    # Responses by url including query.
+    def __init__(self, url, responses):
+        self._urls = {'service': url}
+        self.responses = responses
+        self.sent = []
+
+    def execute(self, method, url, params=None, **kwargs):
+        if params:
+            url += '?' + urlencode(sorted(params.items()))
+        self.sent.append(url)
+        return Response(self.responses[url])
+
+
+def paginate(url, responses, uri, **kwargs):
+    client = Client(url, responses)
+    api = APIBase(client, 'service')
+    return [item['id'] for item in api.paginate(uri, **kwargs)], client.sent
+
+
+class TestPaginate(object):
+    def test_resource_links(self):
+        # Neutron, Nova and Cinder.
+        url = 'http://network:9696/v2.0'
+        items, sent = paginate(url, {
+            url + '/ports?limit=2': {
+                'ports': [{'id': 1}, {'id': 2}],
+                'ports_links': [{'rel': 'next',
+                                 'href': url + '/ports?limit=2&marker=2'}]},
+            url + '/ports?limit=2&marker=2': {
+                'ports': [{'id': 3}],
+                'ports_links': [{'rel': 'previous',
+                                 'href': url + '/ports?limit=2'}]},
+        }, 'ports', limit=2)
+        assert items == [1, 2, 3]
+        assert len(sent) == 2
+
+    def test_keystone_links(self):
+        url = 'http://keystone:5000/v3'
+        items, sent = paginate(url, {
+            url + '/projects': {
+                'projects': [{'id': 1}],
+                'links': {'self': url + '/projects',
+                          'next': url + '/projects?page=2'}},
+            url + '/projects?page=2': {
+                'projects': [{'id': 2}],
+                'links': {'self': url + '/projects?page=2',
+                          'next': None}},
+        }, 'projects', background=False)
+        assert items == [1, 2]
+        assert len(sent) == 2
+
+    def test_glance_next(self):
+        # Path of next is from the service root, not the catalog url.
+        url = 'http://image:9292/v2'
+        items, sent = paginate(url, {
+            url + '/images?limit=1': {
+                'images': [{'id': 1}],
+                'first': '/v2/images?limit=1',
+                'next': '/v2/images?limit=1&marker=1'},
+            url + '/images?limit=1&marker=1': {
+                'images': [{'id': 2}],
+                'first': '/v2/images?limit=1'},
+        }, 'images', limit=1)
+        assert items == [1, 2]
+        assert sent == [url + '/images?limit=1',
+                        url + '/images?limit=1&marker=1']
+
+    def test_marker_limit(self):
+        # Service without links.
+        url = 'http://service:8080'
+        items, sent = paginate(url, {
+            url + '/flavors?limit=2': {
+                'flavors': [{'id': 'a'}, {'id': 'b'}]},
+            url + '/flavors?limit=2&marker=b': {
+                'flavors': [{'id': 'c'}, {'id': 'd'}]},
+            url + '/flavors?limit=2&marker=d': {'flavors': []},
+        }, 'flavors', limit=2)
+        assert items == ['a', 'b', 'c', 'd']
+        assert len(sent) == 3
+
+    def test_single_page(self):
+        url = 'http://service:8080'
+        items, sent = paginate(url, {
+            url + '/flavors?limit=2': {'flavors': [{'id': 'a'}]},
+        }, 'flavors', limit=2)
+        assert items == ['a']
+        assert len(sent) == 1
+
+    def test_resource_from_uri(self):
+        url = 'http://network:9696/v2.0'
+        items, sent = paginate(url, {
+            url + '/security-groups?name=default': {
+                'security_groups': [{'id': 1}]},
+        }, 'security-groups', name='default')
+        assert items == [1]
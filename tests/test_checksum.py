@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import io
+import hashlib
+
+from pytest import raises
+import pytest
+
+from psychokinetic.exceptions import ChecksumError
+from psychokinetic.utils.checksum import (Checksum,
+                                          ChecksumReader,
+                                          expected_md5)
+
+parametrize = pytest.mark.parametrize
+
+DATA = b'psychokinetic' * 10000
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+class Stream(io.BytesIO):
+    def __init__(self, data, headers=None):
+        super().__init__(data)
+        self.headers = headers
+
+
+class TestChecksum(object):
+    def test_update(self):
+        checksum = Checksum()
+        checksum.update(DATA[:10])
+        checksum.update(b'')
+        checksum.update(DATA[10:])
+        assert checksum.hexdigest() == MD5
+        assert checksum.length == len(DATA)
+
+    def test_verify(self):
+        checksum = Checksum()
+        checksum.update(DATA)
+        checksum.verify(MD5)
+        checksum.verify('"%s"' % MD5.upper())
+        checksum.verify(None)
+
+    def test_verify_mismatch(self):
+        checksum = Checksum()
+        checksum.update(DATA)
+        with raises(ChecksumError) as error:
+            checksum.verify('0' * 32)
+        assert error.value.expected == '0' * 32
+        assert error.value.computed == MD5
+
+    def test_iterate(self):
+        checksum = Checksum()
+        assert b''.join(checksum.iterate([DATA[:5], DATA[5:]])) == DATA
+        assert checksum.hexdigest() == MD5
+
+
+class TestChecksumReader(object):
+    def test_verify_at_eof(self):
+        reader = ChecksumReader(Stream(DATA), expected=MD5)
+        assert b''.join(iter(lambda: reader.read(1000), b'')) == DATA
+        assert reader.checksum.hexdigest() == MD5
+
+    def test_mismatch_at_eof(self):
+        reader = ChecksumReader(Stream(DATA), expected='0' * 32)
+        reader.read(1000)
+        with raises(ChecksumError):
+            while reader.read(1000):
+                pass
+
+    def test_read_all(self):
+        reader = ChecksumReader(Stream(DATA), expected='0' * 32)
+        with raises(ChecksumError):
+            reader.read()
+
+    def test_verify_headers(self):
+        reader = ChecksumReader(Stream(DATA, {'X-MD5Hash': '0' * 32}),
+                                verify_headers=True)
+        with raises(ChecksumError):
+            list(reader)
+
+    def test_length(self):
+        reader = ChecksumReader(Stream(DATA), length=len(DATA))
+        reader.read(1000)
+        assert len(reader) == len(DATA) - 1000
+        assert len(ChecksumReader(Stream(DATA))) == 0
+
+    def test_proxy(self):
+        stream = Stream(DATA, {'a': 'b'})
+        assert ChecksumReader(stream).headers == {'a': 'b'}
+
+
+class TestExpectedMD5(object):
+    @parametrize('headers', [
+        {'X-MD5Hash': MD5},
+        {'ETag': '"%s"' % MD5},
+        {'ETag': MD5.upper()},
+    ])
+    def test_md5(self, headers):
+        assert expected_md5(headers) == MD5
+
+    @parametrize('headers', [
+        None,
+        {},
+        {'ETag': 'W/"%s"' % MD5},
+        {'ETag': '"%s-3"' % MD5},
+        {'ETag': '"abc"'},
+    ])
+    def test_ignored(self, headers):
+        assert expected_md5(headers) is None
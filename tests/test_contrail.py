@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import time
+
+from luxon.utils.http import Client
+
+from psychokinetic.openstack.contrail import Contrail, _FQNameCache
+
+URL = 'http://contrail:8082'
+
+
+class Response(object):
+    def __init__(self, json):
+        self.json = json
+
+
+def vn(uuid, detail=True):
+    obj = {'uuid': uuid,
+           'fq_name': ['default-domain', 'admin', 'net-' + uuid],
+           'href': URL + '/virtual-network/' + uuid}
+    if detail:
+        return {'virtual-network': obj}
+    return obj
+
+
+def contrail(monkeypatch, **kwargs):
+    sent = []
+
+    def execute(self, method, url, params=None, data=None, **kw):
+        sent.append((method, url, dict(params or {}), data,))
+        if url == URL + '/fqname-to-id':
+            return Response({'uuid': 'u-' + data['fq_name'][-1]})
+        uuids = (params or {}).get('obj_uuids')
+        uuids = uuids.split(',') if uuids else ['a', 'b']
+        detail = (params or {}).get('detail') == 'True'
+        return Response({'virtual-networks': [vn(uuid, detail)
+                                              for uuid in uuids]})
+
+    monkeypatch.setattr(Client, 'execute', execute)
+    return Contrail(None, URL, **kwargs), sent
+
+
+class TestList(object):
+    def test_detail_unwrapped(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        objects = ct.list('virtual-network', fields=['instance_ip_back_refs'])
+        assert [obj['uuid'] for obj in objects] == ['a', 'b']
+        assert sent[0][1] == URL + '/virtual-networks'
+        assert sent[0][2] == {'detail': 'True',
+                              'fields': 'instance_ip_back_refs'}
+
+    def test_not_detail(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        objects = ct.list('virtual-network', detail=False)
+        assert [obj['uuid'] for obj in objects] == ['a', 'b']
+        assert sent[0][2] == {}
+
+    def test_obj_uuids_chunks(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        uuids = [str(i) for i in range(5)]
+        objects = ct.list('virtual-network', obj_uuids=iter(uuids),
+                          chunk_size=2)
+        # Objects in order of chunks.
+        assert [obj['uuid'] for obj in objects] == uuids
+        chunks = sorted(params['obj_uuids'] for method, url, params, data
+                        in sent)
+        assert chunks == ['0,1', '2,3', '4']
+
+    def test_fills_fq_name_cache(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        ct.list('virtual-network')
+        uuid = ct.fq_name_to_id('virtual-network',
+                                ['default-domain', 'admin', 'net-a'])
+        assert uuid == 'a'
+        assert len(sent) == 1
+
+
+class TestReadRefs(object):
+    def test_batched_once(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        objects = [{'virtual_network_refs': [{'uuid': 'x'}, {'uuid': 'y'}]},
+                   {'virtual_network_refs': [{'uuid': 'y'}]},
+                   {}]
+        refs = ct.read_refs(objects, 'virtual_network_refs')
+        assert [obj['uuid'] for obj in refs] == ['x', 'y']
+        assert len(sent) == 1
+        assert sent[0][1] == URL + '/virtual-networks'
+        assert sent[0][2]['obj_uuids'] == 'x,y'
+
+    def test_back_refs_resource(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        ct.read_refs([{'virtual_network_back_refs': [{'uuid': 'x'}]}],
+                     'virtual_network_back_refs')
+        assert sent[0][1] == URL + '/virtual-networks'
+
+    def test_no_refs(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        assert ct.read_refs([{}], 'virtual_network_refs') == []
+        assert sent == []
+
+
+class TestFQNameCache(object):
+    def test_lookup_cached(self, monkeypatch):
+        ct, sent = contrail(monkeypatch)
+        fq_name = ['default-domain', 'admin', 'net1']
+        assert ct.fq_name_to_id('virtual-network', fq_name) == 'u-net1'
+        assert ct.fq_name_to_id('virtual-network',
+                                tuple(fq_name)) == 'u-net1'
+        assert len(sent) == 1
+        assert sent[0][3] == {'type': 'virtual-network',
+                              'fq_name': fq_name}
+
+    def test_expires(self, monkeypatch):
+        now = [time.monotonic()]
+        monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+        ct, sent = contrail(monkeypatch, ttl=60)
+        fq_name = ['default-domain', 'admin', 'net1']
+        ct.fq_name_to_id('virtual-network', fq_name)
+        now[0] += 30
+        ct.fq_name_to_id('virtual-network', fq_name)
+        assert len(sent) == 1
+        now[0] += 31
+        ct.fq_name_to_id('virtual-network', fq_name)
+        assert len(sent) == 2
+
+    def test_size(self):
+        cache = _FQNameCache(size=2)
+        cache.add('vn', ['a'], 1)
+        cache.add('vn', ['b'], 2)
+        assert cache.get('vn', ['a']) == 1
+        cache.add('vn', ['c'], 3)
+        # Least recently used evicted.
+        assert cache.get('vn', ['b']) is None
+        assert cache.get('vn', ['a']) == 1
+        assert cache.get('vn', ['c']) == 3
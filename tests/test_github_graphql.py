@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from psychokinetic.github import GitHub
+from psychokinetic.github_graphql import (GitHubGraphQL, PROJECTS, COLUMNS,
+                                          COLUMN_CARDS, CARD, _repo, _tag,
+                                          _branch, _card)
+
+API = 'https://api.github.com'
+COMMIT = '%s/repos/org/repo/commits/abc' % API
+ISSUE = '%s/repos/org/repo/issues/1' % API
+
+REST_REPO = {
+    'id': 1,
+    'node_id': 'R_1',
+    'name': 'repo',
+    'full_name': 'org/repo',
+    'owner': {'login': 'org', 'id': 2},
+    'private': False,
+    'fork': False,
+    'archived': False,
+    'description': 'Repository',
+    'html_url': 'https://github.com/org/repo',
+    'url': '%s/repos/org/repo' % API,
+    'homepage': None,
+    'language': 'Python',
+    'default_branch': 'master',
+    'created_at': '2018-01-01T00:00:00Z',
+    'updated_at': '2018-01-02T00:00:00Z',
+    'pushed_at': '2018-01-03T00:00:00Z',
+    'stargazers_count': 3,
+    'watchers_count': 3,
+    'forks_count': 1,
+    'size': 10,
+    'open_issues_count': 0,
+}
+
+REPO_NODE = {
+    'databaseId': 1,
+    'id': 'R_1',
+    'name': 'repo',
+    'nameWithOwner': 'org/repo',
+    'isPrivate': False,
+    'isFork': False,
+    'isArchived': False,
+    'description': 'Repository',
+    'url': 'https://github.com/org/repo',
+    'homepageUrl': None,
+    'primaryLanguage': {'name': 'Python'},
+    'defaultBranchRef': {'name': 'master'},
+    'createdAt': '2018-01-01T00:00:00Z',
+    'updatedAt': '2018-01-02T00:00:00Z',
+    'pushedAt': '2018-01-03T00:00:00Z',
+    'stargazers': {'totalCount': 3},
+    'forkCount': 1,
+    'diskUsage': 10,
+    'owner': {'login': 'org'},
+}
+
+
+def page(nodes, cursor=None):
+    return {'pageInfo': {'hasNextPage': cursor is not None,
+                         'endCursor': cursor},
+            'nodes': nodes}
+
+
+def graphql(monkeypatch, respond):
+    # Data of each query returned by respond(query, variables).
+    sent = []
+    client = GitHubGraphQL(auth=('user', 'token'))
+
+    def query(query, **variables):
+        sent.append((query, variables,))
+        return respond(query, variables)
+
+    monkeypatch.setattr(client, 'query', query)
+    return client, sent
+
+
+def rest(monkeypatch, responses):
+    client = GitHub(auth=('user', 'token'))
+
+    def execute(method, url, headers={}, **kwargs):
+        return responses[url]
+
+    monkeypatch.setattr(client, 'execute', execute)
+    return client
+
+
+class TestStructures(object):
+    def test_repo(self):
+        repo = _repo(REPO_NODE)
+        for key, value in repo.items():
+            if key == 'owner':
+                assert value['login'] == REST_REPO['owner']['login']
+            else:
+                assert value == REST_REPO[key], key
+
+    def test_tag(self):
+        node = {'name': 'v1',
+                'target': {'id': 'T_1', 'oid': 'tag',
+                           'target': {'oid': 'abc'}},
+                'branchProtectionRule': None}
+        assert _tag('org', 'repo', node) == {
+            'name': 'v1',
+            'zipball_url': '%s/repos/org/repo/zipball/refs/tags/v1' % API,
+            'tarball_url': '%s/repos/org/repo/tarball/refs/tags/v1' % API,
+            'commit': {'sha': 'abc', 'url': COMMIT},
+            'node_id': 'T_1'}
+
+    def test_lightweight_tag(self):
+        node = {'name': 'v1',
+                'target': {'id': 'C_1', 'oid': 'abc'},
+                'branchProtectionRule': None}
+        assert _tag('org', 'repo', node)['commit']['sha'] == 'abc'
+
+    def test_branch(self):
+        node = {'name': 'master',
+                'target': {'id': 'C_1', 'oid': 'abc'},
+                'branchProtectionRule': {'id': 'P_1'}}
+        assert _branch('org', 'repo', node) == {
+            'name': 'master',
+            'commit': {'sha': 'abc', 'url': COMMIT},
+            'protected': True}
+
+    def test_card(self):
+        assert _card({'note': 'Remember', 'content': None}) == {
+            'title': 'Note', 'body': 'Remember', 'html_url': None,
+            'assignees': []}
+        content = {'title': 'Bug', 'body': 'Broken',
+                   'url': 'https://github.com/org/repo/issues/1',
+                   'assignees': {'nodes': [{'login': 'dev'}]}}
+        assert _card({'note': None, 'content': content}) == {
+            'title': 'Bug', 'body': 'Broken',
+            'html_url': 'https://github.com/org/repo/issues/1',
+            'assignees': ['dev']}
+
+
+class TestQueries(object):
+    def test_cards_not_nested(self):
+        # Nested cards exceed the node limit of a query.
+        assert 'cards' not in PROJECTS
+        assert 'cards' not in COLUMNS
+        assert 'assignees(first: 100)' not in CARD
+
+
+class TestProjects(object):
+    def test_same_as_rest(self, monkeypatch):
+        github = rest(monkeypatch, {
+            '/orgs/org/projects': [
+                {'id': 1, 'name': 'Open', 'body': 'Board', 'state': 'open',
+                 'html_url': 'https://github.com/orgs/org/projects/1'},
+                {'id': 2, 'name': 'Closed', 'body': None,
+                 'state': 'closed',
+                 'html_url': 'https://github.com/orgs/org/projects/2'}],
+            '/projects/1/columns': [{'id': 11, 'name': 'To do'},
+                                    {'id': 12, 'name': 'Done'}],
+            'projects/columns/11/cards': [{'note': None,
+                                           'content_url': ISSUE},
+                                          {'note': 'Remember'}],
+            'projects/columns/12/cards': [],
+            ISSUE: {'title': 'Bug', 'body': 'Broken',
+                    'html_url': 'https://github.com/org/repo/issues/1',
+                    'assignees': [{'login': 'dev'}]}})
+
+        issue = {'note': None,
+                 'content': {'title': 'Bug', 'body': 'Broken',
+                             'url': 'https://github.com/org/repo/issues/1',
+                             'assignees': {'nodes': [{'login': 'dev'}]}}}
+        note = {'note': 'Remember', 'content': None}
+        projects = page([
+            {'id': 'P_1', 'databaseId': 1, 'name': 'Open', 'body': 'Board',
+             'state': 'OPEN',
+             'url': 'https://github.com/orgs/org/projects/1',
+             'columns': page([{'id': 'C_11', 'name': 'To do'}], 'c1')},
+            {'id': 'P_2', 'databaseId': 2, 'name': 'Closed', 'body': None,
+             'state': 'CLOSED',
+             'url': 'https://github.com/orgs/org/projects/2',
+             'columns': page([])}])
+        columns = page([{'id': 'C_12', 'name': 'Done'}])
+        cards = {('C_11', None): page([issue], 'k1'),
+                 ('C_11', 'k1'): page([note]),
+                 ('C_12', None): page([])}
+
+        def respond(query, variables):
+            if query == PROJECTS:
+                return {'organization': {'projects': projects}}
+            if query == COLUMNS:
+                assert variables == {'id': 'P_1', 'cursor': 'c1'}
+                return {'node': {'columns': columns}}
+            assert query == COLUMN_CARDS
+            return {'node': {'cards': cards[(variables['id'],
+                                             variables['cursor'],)]}}
+
+        graph, sent = graphql(monkeypatch, respond)
+        assert graph.projects('org') == github.projects('org')
+        assert len(sent) == 5
+
+
+class TestRepos(object):
+    def test_pages(self, monkeypatch):
+        second = dict(REPO_NODE, databaseId=2, name='other',
+                      nameWithOwner='org/other')
+
+        def respond(query, variables):
+            nodes = {None: page([REPO_NODE], 'r1'),
+                     'r1': page([second])}[variables['cursor']]
+            return {'repositoryOwner': {'repositories': nodes}}
+
+        graph, sent = graphql(monkeypatch, respond)
+        repos = graph.repos('org')
+        assert [repo['full_name'] for repo in repos] == ['org/repo',
+                                                         'org/other']
+        assert len(sent) == 2
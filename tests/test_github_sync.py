@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import types
+
+import psychokinetic.github
+from psychokinetic.github import GitHub
+from psychokinetic.github_sync import GitHubSync
+
+API = 'https://api.github.com'
+
+
+def commit(sha, date):
+    return {'sha': sha, 'commit': {'committer': {'date': date}}}
+
+
+def event(id):
+    return {'id': str(id), 'type': 'PushEvent'}
+
+
+class FakeGitHub(object):
+    # Commits oldest first and events newest first, as listed by GitHub.
+    def __init__(self, commits=(), events=()):
+        self.commits = list(commits)
+        self.events = list(events)
+        self.requests = []
+        self.yielded = 0
+
+    def paginate(self, method, url, ahead=True, **params):
+        self.requests.append((url, params,))
+        if url.endswith('/commits'):
+            since = params.get('since')
+            for item in reversed(self.commits):
+                if since is None or item['commit']['committer'][
+                        'date'] >= since:
+                    yield item
+        else:
+            for item in self.events:
+                self.yielded += 1
+                yield item
+
+
+class TestCommits(object):
+    def test_since_mark(self, tmpdir):
+        github = FakeGitHub([commit('a', '2018-01-01T00:00:00Z'),
+                             commit('b', '2018-01-02T00:00:00Z'),
+                             commit('c', '2018-01-02T00:00:00Z')])
+        sync = GitHubSync(github, str(tmpdir))
+        new = sync.sync_commits('org', 'repo')
+        assert new[0]['sha'] == 'a'
+        assert sorted(item['sha'] for item in new) == ['a', 'b', 'c']
+        assert github.requests[0][1] == {}
+
+        # Commit at the same date as the mark is new, b and c are known.
+        github.commits.append(commit('d', '2018-01-02T00:00:00Z'))
+        new = sync.sync_commits('org', 'repo')
+        assert [item['sha'] for item in new] == ['d']
+        assert github.requests[1][1] == {'since': '2018-01-02T00:00:00Z'}
+        mark = sync._mark('org', 'repo', 'commits')
+        assert mark['date'] == '2018-01-02T00:00:00Z'
+        assert sorted(mark['shas']) == ['b', 'c', 'd']
+
+        assert sync.sync_commits('org', 'repo') == []
+
+        github.commits.append(commit('e', '2018-01-03T00:00:00Z'))
+        assert [item['sha'] for item in
+                sync.sync_commits('org', 'repo')] == ['e']
+        assert sync._mark('org', 'repo', 'commits')['shas'] == ['e']
+
+    def test_store_appended(self, tmpdir):
+        github = FakeGitHub([commit('a', '2018-01-01T00:00:00Z')])
+        sync = GitHubSync(github, str(tmpdir))
+        sync.sync_commits('org', 'repo')
+        github.commits.append(commit('b', '2018-01-02T00:00:00Z'))
+        sync.sync_commits('org', 'repo')
+
+        path = os.path.join(str(tmpdir), 'commits', 'org',
+                            'repo.jsonl.gz')
+        with open(path, 'rb') as f:
+            # One gzip member per run.
+            assert f.read().count(b'\x1f\x8b\x08') == 2
+
+        # State and store are kept between instances.
+        sync = GitHubSync(github, str(tmpdir))
+        assert [item['sha'] for item in
+                sync.commits('org', 'repo')] == ['a', 'b']
+        assert sync.sync_commits('org', 'repo') == []
+
+    def test_nothing_stored(self, tmpdir):
+        sync = GitHubSync(FakeGitHub(), str(tmpdir))
+        assert sync.sync_commits('org', 'repo') == []
+        assert list(sync.commits('org', 'repo')) == []
+
+
+class TestEvents(object):
+    def test_id_cutoff(self, tmpdir):
+        github = FakeGitHub(events=[event(3), event(2), event(1)])
+        sync = GitHubSync(github, str(tmpdir))
+        new = sync.sync_events('org', 'repo')
+        assert [item['id'] for item in new] == ['1', '2', '3']
+
+        github.events = [event(5), event(4), event(3), event(2), event(1)]
+        github.yielded = 0
+        new = sync.sync_events('org', 'repo')
+        assert [item['id'] for item in new] == ['4', '5']
+        # Stopped at the first known event.
+        assert github.yielded == 3
+        assert sync._mark('org', 'repo', 'events') == {'id': '5'}
+        assert [item['id'] for item in
+                sync.events('org', 'repo')] == ['1', '2', '3', '4', '5']
+
+    def test_ids_compared_as_numbers(self, tmpdir):
+        github = FakeGitHub(events=[event(9)])
+        sync = GitHubSync(github, str(tmpdir))
+        sync.sync_events('org', 'repo')
+        github.events = [event(10), event(9)]
+        assert [item['id'] for item in
+                sync.sync_events('org', 'repo')] == ['10']
+
+    def test_pages_not_fetched_ahead(self, tmpdir, monkeypatch):
+        # 10 pages of 30 events, newest first.
+        url = '%s/repos/org/repo/events' % API
+        pages = [[event(300 - page * 30 - i) for i in range(30)]
+                 for page in range(10)]
+        requests = []
+
+        def links(header):
+            if header is None:
+                return None
+            next_url, last_url = header
+            return types.SimpleNamespace(next=[{'link': next_url}],
+                                         last=[{'link': last_url}])
+
+        def request(method, request_url, headers, params=None,
+                    priority=0):
+            requests.append(request_url)
+            number = 1
+            if '?page=' in request_url:
+                number = int(request_url.split('?page=')[1])
+            link = None
+            if number < 10:
+                link = ('%s?page=%s' % (url, number + 1,),
+                        '%s?page=10' % url,)
+            return types.SimpleNamespace(status_code=200,
+                                         headers={'link': link},
+                                         json=pages[number - 1])
+
+        monkeypatch.setattr(psychokinetic.github, 'parse_link_header',
+                            links)
+        github = GitHub()
+        monkeypatch.setattr(github, '_request', request)
+        sync = GitHubSync(github, str(tmpdir))
+        sync._store('org', 'repo', 'events', [], {'id': '265'})
+
+        new = sync.sync_events('org', 'repo')
+        assert len(new) == 35
+        assert len(requests) == 2
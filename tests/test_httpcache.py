@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import time
+
+from luxon.utils.http import Client
+
+from psychokinetic.github import GitHub
+from psychokinetic.utils.httpcache import HTTPCache
+
+
+class Response(object):
+    def __init__(self, status_code, headers, json=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.json = json
+
+
+class TestHTTPCache(object):
+    def test_get_set(self, tmpdir):
+        cache = HTTPCache(os.path.join(str(tmpdir), 'cache.db'))
+        assert cache.get('key') is None
+        cache.set('key', '"etag"', None, {'link': None}, [1, 2])
+        assert cache.get('key') == {'etag': '"etag"',
+                                    'modified': None,
+                                    'headers': {'link': None},
+                                    'body': [1, 2]}
+
+    def test_evict_least_recently_used(self, tmpdir):
+        cache = HTTPCache(os.path.join(str(tmpdir), 'cache.db'), size=2)
+        cache.set('a', 'a', None, {}, 'a')
+        time.sleep(0.01)
+        cache.set('b', 'b', None, {}, 'b')
+        time.sleep(0.01)
+        # Used most recently, 'b' is now least recently used.
+        assert cache.get('a') is not None
+        time.sleep(0.01)
+        cache.set('c', 'c', None, {}, 'c')
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+        assert cache.get('c') is not None
+
+    def test_persistent(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'cache.db')
+        HTTPCache(path).set('key', 'etag', None, {}, {'a': 1})
+        assert HTTPCache(path).get('key')['body'] == {'a': 1}
+
+    def test_clear(self, tmpdir):
+        cache = HTTPCache(os.path.join(str(tmpdir), 'cache.db'))
+        cache.set('key', 'etag', None, {}, None)
+        cache.clear()
+        assert cache.get('key') is None
+
+
+class TestGitHubCache(object):
+    def test_not_modified(self, tmpdir, monkeypatch):
+        sent = []
+        link = '<https://api.github.com/user/repos?page=2>; rel="next"'
+
+        def execute(self, method, url, headers=None, params=None,
+                    data=None, **kwargs):
+            sent.append(dict(headers))
+            if 'If-None-Match' in headers:
+                return Response(304, {'ETag': '"v1"'})
+            return Response(200, {'ETag': '"v1"', 'link': link},
+                            [{'name': 'repo'}])
+
+        monkeypatch.setattr(Client, 'execute', execute)
+        github = GitHub(cache=os.path.join(str(tmpdir), 'cache.db'))
+        url = 'https://api.github.com/user/repos'
+
+        response = github._request('GET', url, {})
+        assert response.status_code == 200
+        assert 'If-None-Match' not in sent[0]
+
+        response = github._request('GET', url, {})
+        assert sent[1]['If-None-Match'] == '"v1"'
+        assert response.status_code == 304
+        assert response.json == [{'name': 'repo'}]
+        assert response.headers['link'] == link
+
+    def test_not_cached_without_validator(self, tmpdir, monkeypatch):
+        sent = []
+
+        def execute(self, method, url, headers=None, params=None,
+                    data=None, **kwargs):
+            sent.append(dict(headers))
+            return Response(200, {}, [])
+
+        monkeypatch.setattr(Client, 'execute', execute)
+        github = GitHub(cache=os.path.join(str(tmpdir), 'cache.db'))
+        url = 'https://api.github.com/user/repos'
+        github._request('GET', url, {})
+        github._request('GET', url, {})
+        assert 'If-None-Match' not in sent[1]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from pytest import raises
+
+from luxon.exceptions import FieldMissing
+
+from psychokinetic.openstack.api.identityv3 import (IdentityV3,
+                                                    _project,
+                                                    _token_scope)
+
+
+class Client(object):
+    keystone_url = 'http://keystone:5000/v3'
+
+    def __init__(self, username, password, domain):
+        self._credentials = (username, password, domain,)
+
+
+class TestTokenKey(object):
+    def key(self, password, project=None):
+        identity = IdentityV3(Client('admin', password, 'default'),
+                              'identity')
+        return identity._token_key(project)
+
+    def test_same_credentials(self):
+        assert self.key('secret') == self.key('secret')
+
+    def test_password_changes_key(self):
+        assert self.key('secret') != self.key('guess')
+        assert self.key('secret', 'p1') != self.key('guess', 'p1')
+
+    def test_password_not_in_key(self):
+        assert 'secret' not in repr(self.key('secret'))
+
+
+class TestScopeRequest(object):
+    def test_project_id(self):
+        assert _project(project_id='p1') == {'id': 'p1'}
+
+    def test_project_name(self):
+        assert _project('default', project_name='admin') == {
+            'domain': {'name': 'default'}, 'name': 'admin'}
+
+    def test_project_name_requires_domain(self):
+        with raises(FieldMissing):
+            _project(project_name='admin')
+
+    def test_project_required(self):
+        with raises(FieldMissing):
+            _project('default')
+
+    def test_token_scope(self):
+        body = _token_scope('token', {'id': 'p1'})
+        assert body['auth']['identity'] == {'methods': ['token'],
+                                            'token': {'id': 'token'}}
+        assert body['auth']['scope'] == {'project': {'id': 'p1'}}
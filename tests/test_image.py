@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import io
+import os
+import hashlib
+
+from pytest import raises
+
+from psychokinetic.exceptions import ChecksumError
+from psychokinetic.openstack.api.imagev2 import ImageV2
+
+URL = 'http://image:9292'
+DATA = b'0123456789' * 10
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+class Response(object):
+    def __init__(self, json=None):
+        self.json = json
+
+
+class Stream(object):
+    def __init__(self, data, headers):
+        self._data = io.BytesIO(data)
+        self.headers = headers
+        self.opened = False
+        self.closed = False
+
+    def open(self):
+        self.opened = True
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+    def close(self):
+        self.closed = True
+
+
+class Client(object):
+    # Image service storing uploaded data, with checksum of image.
+    def __init__(self, checksum=MD5, data=DATA, headers=None):
+        self._urls = {'image': URL}
+        self._discovered = {('image', URL,): URL + '/v2'}
+        self.checksum = checksum
+        self.data = data
+        self.headers = headers or {}
+        self.uploaded = None
+        self.streams = []
+
+    def execute(self, method, url, data=None, headers=None, **kwargs):
+        if method == 'PUT':
+            self.uploaded = b''.join(data)
+            return Response()
+        return Response({'id': 'i1', 'checksum': self.checksum})
+
+    def stream(self, method, url):
+        assert url == URL + '/v2/images/i1/file'
+        stream = Stream(self.data, self.headers)
+        self.streams.append(stream)
+        return stream
+
+
+class Progress(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, length, total):
+        self.calls.append((length, total,))
+
+
+def image(client):
+    return ImageV2(client, 'image')
+
+
+class TestUpload(object):
+    def test_bytes(self):
+        client = Client()
+        progress = Progress()
+        result = image(client).upload('i1', DATA, progress, 40)
+        assert result['id'] == 'i1'
+        assert client.uploaded == DATA
+        assert progress.calls == [(40, 100,), (80, 100,), (100, 100,)]
+
+    def test_path(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'image')
+        with open(path, 'wb') as f:
+            f.write(DATA)
+        client = Client()
+        image(client).upload('i1', path)
+        assert client.uploaded == DATA
+
+    def test_iterable_total_unknown(self):
+        progress = Progress()
+        image(Client()).upload('i1', iter([DATA[:50], DATA[50:]]), progress)
+        assert progress.calls == [(50, None,), (100, None,)]
+
+    def test_checksum_mismatch(self):
+        with raises(ChecksumError):
+            image(Client(checksum='0' * 32)).upload('i1', DATA)
+
+
+class TestDownload(object):
+    def test_file(self):
+        client = Client(headers={'Content-Length': '100'})
+        progress = Progress()
+        f = io.BytesIO()
+        md5 = image(client).download('i1', f, progress, 60)
+        assert md5 == MD5
+        assert f.getvalue() == DATA
+        assert progress.calls == [(60, 100,), (100, 100,)]
+        assert client.streams[0].opened and client.streams[0].closed
+
+    def test_content_md5(self):
+        # Checksum of response preferred over checksum of image.
+        client = Client(checksum='0' * 32, headers={'Content-MD5': MD5})
+        assert image(client).download('i1', io.BytesIO()) == MD5
+
+    def test_path(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'image')
+        image(Client()).download('i1', path)
+        with open(path, 'rb') as f:
+            assert f.read() == DATA
+
+    def test_checksum_mismatch_removes_file(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'image')
+        client = Client(checksum='0' * 32)
+        with raises(ChecksumError):
+            image(client).download('i1', path)
+        assert not os.path.exists(path)
+        assert client.streams[0].closed
+
+    def test_checksum_mismatch_file(self):
+        f = io.BytesIO()
+        with raises(ChecksumError):
+            image(Client(checksum='0' * 32)).download('i1', f)
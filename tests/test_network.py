@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from psychokinetic.openstack.api.networkv2 import NetworkV2
+
+
+class Error(Exception):
+    def __init__(self, status=None):
+        super().__init__(status)
+        self.status = status
+
+
+class Response(object):
+    def __init__(self, json):
+        self.json = json
+
+
+class Client(object):
+    _urls = {'network': 'http://neutron'}
+    _discovered = {('network', 'http://neutron',): 'http://neutron/v2.0'}
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.posts = []
+
+    def execute(self, method, url, data=None, **kwargs):
+        self.posts.append(data)
+        error = self.fail(data)
+        if error is not None:
+            raise error
+        if 'ports' in data:
+            return Response({'ports': [dict(item, id=item['name'])
+                                       for item in data['ports']]})
+        return Response({'port': dict(data['port'], id=data['port']['name'])})
+
+
+def create(client, count):
+    network = NetworkV2(client, 'network')
+    return list(network.bulk_create('port',
+                                    [{'name': str(i)} for i in range(count)],
+                                    chunk_size=count))
+
+
+class TestBulkCreate(object):
+    def test_chunk(self):
+        client = Client(lambda data: None)
+        results = create(client, 3)
+        assert [result['result']['id'] for result in results] == \
+            ['0', '1', '2']
+        assert len(client.posts) == 1
+
+    def test_rejected_chunk_created_per_item(self):
+        def fail(data):
+            if 'ports' in data:
+                return Error(400)
+            if data['port']['name'] == '1':
+                return Error(400)
+
+        client = Client(fail)
+        results = create(client, 3)
+        assert [result['error'] is None for result in results] == \
+            [True, False, True]
+        assert len(client.posts) == 4
+
+    def test_ambiguous_failure_not_repeated(self):
+        client = Client(lambda data: Error(None))
+        results = create(client, 3)
+        assert all(result['error'] is not None for result in results)
+        assert len(client.posts) == 1
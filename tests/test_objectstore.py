@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import gc
+import io
+import hashlib
+
+from pytest import raises
+
+from luxon.exceptions import NotFoundError
+
+from psychokinetic.exceptions import ChecksumError
+from psychokinetic.objectstore import client as objectstore
+from psychokinetic.objectstore.client import ObjectStore
+from psychokinetic.utils.stream import compress
+
+
+class Stream(io.BytesIO):
+    def __init__(self, data, headers):
+        super().__init__(data)
+        self.headers = headers
+
+    def open(self):
+        pass
+
+
+class Client(ObjectStore):
+    def __init__(self, data, headers):
+        self.data = data
+        self.headers = headers
+        self.streams = []
+
+    def stream(self, method, path, endpoint=None):
+        stream = Stream(self.data, self.headers)
+        self.streams.append(stream)
+        return stream
+
+
+class Response(object):
+    def __init__(self, headers=None, json=None):
+        self.headers = headers or {}
+        self.json = json
+
+
+class Store(ObjectStore):
+    # In memory object store, optionally without server side copies.
+    def __init__(self, url, copy=True):
+        self.endpoints = {'katalog': url}
+        self.copy = copy
+        self.objects = {}
+        self.requests = []
+
+    def execute(self, method, path, data=None, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append((method, path, dict(headers),))
+        path = path.strip('/').split('v1/', 1)[1]
+        if method == 'HEAD':
+            if path not in self.objects:
+                raise NotFoundError(path)
+        elif method == 'DELETE':
+            del self.objects[path]
+            return Response()
+        elif method == 'PUT':
+            if self.copy and 'X-Copy-From' in headers:
+                data = self.objects[headers['X-Copy-From']]
+            if isinstance(data, bytes):
+                self.objects[path] = data
+            else:
+                self.objects[path] = b''.join(data)
+        md5hash = hashlib.md5(self.objects[path]).hexdigest()
+        return Response({'X-MD5Hash': md5hash})
+
+
+class TestDedupe(object):
+    def setup_method(self, method):
+        objectstore._content_index = objectstore._ContentIndex()
+        objectstore._copy_support.clear()
+
+    def test_copy_server_side(self):
+        store = Store('http://copy')
+        store.put_object('t', 'c', 'a', b'data', raw=True, dedupe=True)
+        store.put_object('t', 'c', 'b', b'data', raw=True, dedupe=True)
+        assert store.objects == {'t/c/a': b'data', 't/c/b': b'data'}
+        copies = [headers for method, path, headers in store.requests
+                  if 'X-Copy-From' in headers]
+        assert copies
+        for headers in copies:
+            assert headers['X-Copy-From'] == 't/c/a'
+            assert 'X-MD5Hash' not in headers
+        # Copy support is probed once.
+        store.put_object('t', 'c', 'd', b'data', raw=True, dedupe=True)
+        assert len([headers for method, path, headers in store.requests
+                    if 'X-Copy-From' in headers]) == len(copies) + 1
+
+    def test_without_copy_support(self):
+        store = Store('http://nocopy', copy=False)
+        store.put_object('t', 'c', 'a', b'data', raw=True, dedupe=True)
+        store.objects['t/c/b'] = b'old'
+        store.put_object('t', 'c', 'b', b'data', raw=True, dedupe=True)
+        assert store.objects == {'t/c/a': b'data', 't/c/b': b'data'}
+        # Target is never replaced by an empty copy.
+        assert not [path for method, path, headers in store.requests
+                    if path.endswith('/b') and 'X-Copy-From' in headers]
+
+    def test_index_per_tenant(self):
+        store = Store('http://copy')
+        store.put_object('t1', 'c', 'a', b'data', raw=True, dedupe=True)
+        store.put_object('t2', 'c', 'a', b'data', raw=True, dedupe=True)
+        assert not [headers for method, path, headers in store.requests
+                    if 'X-Copy-From' in headers]
+
+
+class TestGetObject(object):
+    def test_raw_object_readable(self):
+        data = b'x' * 200000
+        client = Client(data, {'Content-Type': 'application/octet-stream',
+                               'X-MD5Hash': hashlib.md5(data).hexdigest()})
+        reader = client.get_object('t', 'c', 'o')
+        gc.collect()
+        assert not reader.closed
+        assert not client.streams[0].closed
+        # Checksum is verified at end of stream.
+        assert b''.join(reader) == data
+
+    def test_raw_object_checksum_mismatch(self):
+        client = Client(b'data', {'Content-Type': 'application/octet-stream',
+                                  'X-MD5Hash': '0' * 32})
+        reader = client.get_object('t', 'c', 'o')
+        with raises(ChecksumError):
+            reader.read()
+
+    def test_compressed_object(self):
+        data = b'y' * 100000
+        content = compress(data, 'gzip')
+        client = Client(content, {'Content-Type': 'text/plain',
+                                  'Content-Encoding': 'gzip',
+                                  'X-MD5Hash':
+                                  hashlib.md5(content).hexdigest()})
+        assert client.get_object('t', 'c', 'o').read() == data
+
+
+class Listing(ObjectStore):
+    def __init__(self, names, payload=False):
+        self.names = names
+        self.payload = payload
+        self.requests = []
+
+    def execute(self, method, path, params=None, limit=None, **kwargs):
+        self.requests.append(dict(params))
+        names = [name for name in self.names
+                 if name > params.get('marker', '')]
+        names = [name for name in names
+                 if name.startswith(params.get('prefix', ''))]
+        page = [{'name': name} for name in names[:limit]]
+        if self.payload:
+            return Response(json={'payload': page})
+        return Response(json=page)
+
+
+class TestListPages(object):
+    def test_marker(self):
+        names = ['object%03d' % i for i in range(25)]
+        listing = Listing(names)
+        pages = list(listing._list_pages('/v1/t/c', limit=10))
+        assert [len(page) for page in pages] == [10, 10, 5]
+        assert [params.get('marker') for params in listing.requests] == \
+            [None, 'object009', 'object019']
+
+    def test_full_last_page(self):
+        listing = Listing(['a', 'b', 'c', 'd'], payload=True)
+        pages = list(listing._list_pages('/v1/t/c', limit=2))
+        assert [[obj['name'] for obj in page] for page in pages] == \
+            [['a', 'b'], ['c', 'd']]
+        assert listing.requests[-1]['marker'] == 'd'
+
+    def test_prefix(self):
+        listing = Listing(['a1', 'a2', 'b1'])
+        names = [obj['name'] for obj in listing._list('/v1/t/c',
+                                                      prefix='a', limit=1)]
+        assert names == ['a1', 'a2']
+        assert all(params['prefix'] == 'a' for params in listing.requests)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from pytest import raises
+
+from luxon.exceptions import TokenExpiredError
+from luxon.utils.http import Client
+
+from psychokinetic.openstack.openstack import Openstack
+
+
+class Response(object):
+    def __init__(self, token):
+        self.token = token
+
+
+def openstack(monkeypatch, sent):
+    def execute(self, method, url, params=None, data=None, **kwargs):
+        if not isinstance(data, (bytes, type(None),)):
+            data = b''.join(data)
+        sent.append(data)
+        if self['X-Auth-Token'] == 'expired':
+            raise TokenExpiredError()
+        return Response(self['X-Auth-Token'])
+
+    def reauthenticate():
+        os['X-Auth-Token'] = 'renewed'
+        return True
+
+    monkeypatch.setattr(Client, 'execute', execute)
+    os = Openstack('http://keystone:5000/v3')
+    os['X-Auth-Token'] = 'expired'
+    monkeypatch.setattr(os.identity, 'reauthenticate', reauthenticate)
+    return os
+
+
+class TestReauthenticate(object):
+    def test_retry_bytes(self, monkeypatch):
+        sent = []
+        os = openstack(monkeypatch, sent)
+        response = os.execute('PUT', 'http://image/file', data=b'data')
+        assert response.token == 'renewed'
+        assert sent == [b'data', b'data']
+
+    def test_no_retry_stream(self, monkeypatch):
+        sent = []
+        os = openstack(monkeypatch, sent)
+        with raises(TokenExpiredError):
+            os.execute('PUT', 'http://image/file',
+                       data=iter([b'da', b'ta']))
+        assert sent == [b'data']
+        # Authenticated again, sending again succeeds.
+        response = os.execute('PUT', 'http://image/file',
+                              data=iter([b'da', b'ta']))
+        assert response.token == 'renewed'
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import time
+
+from luxon.exceptions import NotFoundError
+from luxon.utils.http import Client
+
+from psychokinetic.openstack.pool import ScopedPool
+
+KEYSTONE = 'http://keystone:5000/v3'
+EXPIRES_AT = '2030-01-01T00:00:00.000000Z'
+
+
+class Response(object):
+    def __init__(self, token, body):
+        self.headers = {'x-subject-token': token}
+        self.json = body
+
+
+class Keystone(object):
+    # Fake identity service, projects in missing do not exist.
+    def __init__(self, monkeypatch, missing=()):
+        self.missing = missing
+        self.tokens = 0
+        self.passwords = 0
+        self.scoped = []
+        keystone = self
+
+        def execute(self, method, url, params=None, data=None, **kwargs):
+            return keystone.execute(method, url, data)
+
+        monkeypatch.setattr(Client, 'execute', execute)
+
+    def execute(self, method, url, data):
+        assert method == 'POST' and url == KEYSTONE + '/auth/tokens'
+        if isinstance(data, str):
+            data = json.loads(data)
+        identity = data['auth']['identity']
+        self.tokens += 1
+        token = 'token%s' % self.tokens
+        if 'password' in identity['methods']:
+            self.passwords += 1
+            return Response(token, {'token': {'expires_at': EXPIRES_AT}})
+
+        project_id = data['auth']['scope']['project']['id']
+        if project_id in self.missing:
+            raise NotFoundError('Project %s not found' % project_id)
+        self.scoped.append((project_id, identity['token']['id'],))
+        return Response(token, {'token': {'expires_at': EXPIRES_AT,
+                                          'project': {'id': project_id},
+                                          'catalog': []}})
+
+
+def pool(**kwargs):
+    # Background refresh is not run during tests.
+    return ScopedPool(KEYSTONE, 'admin', 'secret', 'default',
+                      interval=3600, **kwargs)
+
+
+class TestScope(object):
+    def test_login_token_shared(self, monkeypatch):
+        keystone = Keystone(monkeypatch)
+        with pool() as scoped:
+            results = list(scoped.scope(['p1', 'p2', 'p3']))
+            assert all(result['error'] is None for result in results)
+            assert keystone.passwords == 1
+            assert sorted(keystone.scoped) == [('p1', 'token1',),
+                                               ('p2', 'token1',),
+                                               ('p3', 'token1',)]
+            client = scoped.client('p1')
+            assert client['project_id_header'] == 'p1'
+            assert client._login_token == 'token1'
+            # Clients are kept.
+            assert scoped.client('p1') is client
+            assert len(keystone.scoped) == 3
+
+    def test_scope_error(self, monkeypatch):
+        Keystone(monkeypatch, missing=('gone',))
+        with pool() as scoped:
+            results = {result['project_id']: result['error']
+                       for result in scoped.scope(['p1', 'gone'])}
+            assert results['p1'] is None
+            assert isinstance(results['gone'], NotFoundError)
+
+    def test_map(self, monkeypatch):
+        Keystone(monkeypatch, missing=('gone',))
+
+        def project(client):
+            if client['project_id_header'] == 'p2':
+                raise ValueError('Failed')
+            return client['project_id_header']
+
+        with pool() as scoped:
+            results = list(scoped.map(project, ['p1', 'p2', 'gone'],
+                                      ordered=True))
+        assert [result['project_id'] for result in results] == ['p1', 'p2',
+                                                                'gone']
+        assert results[0]['result'] == 'p1'
+        assert results[0]['error'] is None
+        assert results[1]['result'] is None
+        assert isinstance(results[1]['error'], ValueError)
+        assert isinstance(results[2]['error'], NotFoundError)
+
+
+class TestRefresh(object):
+    def test_nothing_expiring(self, monkeypatch):
+        keystone = Keystone(monkeypatch)
+        with pool() as scoped:
+            list(scoped.scope(['p1']))
+            tokens = keystone.tokens
+            scoped.refresh()
+            assert keystone.tokens == tokens
+
+    def test_rescope_expiring(self, monkeypatch):
+        keystone = Keystone(monkeypatch)
+        with pool(margin=600) as scoped:
+            list(scoped.scope(['p1', 'p2']))
+            expiring = scoped.client('p1')
+            valid = scoped.client('p2')
+            token = valid['X-Auth-Token']
+            expiring._expires = time.time() + 60
+            keystone.scoped = []
+
+            scoped.refresh()
+            assert keystone.passwords == 1
+            assert keystone.scoped == [('p1', 'token1',)]
+            assert expiring['X-Auth-Token'] != token
+            assert valid['X-Auth-Token'] == token
+
+    def test_reauthenticate_login(self, monkeypatch):
+        keystone = Keystone(monkeypatch)
+        with pool(margin=600) as scoped:
+            list(scoped.scope(['p1', 'p2']))
+            scoped._login_expires = time.time() + 60
+            scoped.client('p1')._expires = time.time() + 60
+            keystone.scoped = []
+
+            scoped.refresh()
+            assert keystone.passwords == 2
+            login = scoped._login._login_token
+            assert login == 'token%s' % (keystone.tokens - 1)
+            # Expiring client is scoped with the new login token.
+            assert keystone.scoped == [('p1', login,)]
+            assert scoped.client('p1')._login_token == login
+
+    def test_close(self, monkeypatch):
+        Keystone(monkeypatch)
+        scoped = pool()
+        scoped.close()
+        assert not scoped._refresher.is_alive()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import time
+import threading
+
+from psychokinetic.utils.ratelimit import Scheduler
+
+
+def headers(limit, remaining, reset, resource=None):
+    headers = {'X-RateLimit-Limit': str(limit),
+               'X-RateLimit-Remaining': str(remaining),
+               'X-RateLimit-Reset': str(int(reset))}
+    if resource is not None:
+        headers['X-RateLimit-Resource'] = resource
+    return headers
+
+
+class TestResources(object):
+    def test_separate_budgets(self):
+        scheduler = Scheduler()
+        reset = time.time() + 3600
+        scheduler.acquire()
+        scheduler.release(headers(5000, 4000, reset, 'core'))
+        scheduler.acquire(resource='graphql')
+        scheduler.release(headers(5000, 10, reset, 'graphql'), 'graphql')
+        assert scheduler.remaining == 4000
+        assert scheduler.budget('graphql') == (5000, 10, int(reset),)
+
+    def test_resource_header(self):
+        scheduler = Scheduler()
+        scheduler.acquire(resource='graphql')
+        scheduler.release(headers(5000, 10, time.time() + 3600, 'graphql'))
+        assert scheduler.remaining is None
+        assert scheduler.budget('graphql')[1] == 10
+
+    def test_exhausted_budget_does_not_block_others(self):
+        scheduler = Scheduler()
+        scheduler.acquire(resource='graphql')
+        scheduler.release(headers(5000, 0, time.time() + 3600, 'graphql'),
+                          'graphql')
+        start = time.time()
+        scheduler.acquire()
+        scheduler.release()
+        assert time.time() - start < 1
+
+    def test_waiting_priority_does_not_block_others(self):
+        scheduler = Scheduler()
+        scheduler.acquire(resource='graphql')
+        scheduler.release(headers(5000, 0, time.time() + 2, 'graphql'),
+                          'graphql')
+        started = []
+
+        def graphql():
+            scheduler.acquire(priority=10, resource='graphql')
+            started.append(time.time())
+            scheduler.release(resource='graphql')
+
+        thread = threading.Thread(target=graphql)
+        thread.start()
+        time.sleep(0.1)
+        start = time.time()
+        scheduler.acquire()
+        scheduler.release()
+        assert time.time() - start < 0.5
+        assert not started
+        thread.join()
+        assert started
+
+
+class TestScheduler(object):
+    def test_priority_order(self):
+        scheduler = Scheduler(concurrency=1)
+        scheduler.acquire()
+        order = []
+
+        def request(priority):
+            scheduler.acquire(priority)
+            order.append(priority)
+            scheduler.release()
+
+        threads = []
+        for priority in (1, 5, 3,):
+            thread = threading.Thread(target=request, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+        assert order == [5, 3, 1]
+
+    def test_concurrency_below_low(self):
+        scheduler = Scheduler(concurrency=8, low=0.1)
+        reset = time.time() + 3600
+        assert scheduler._allowed(scheduler._budget('core')) == 8
+        scheduler.acquire()
+        scheduler.release(headers(1000, 50, reset))
+        assert scheduler._allowed(scheduler._budget('core')) == 4
+        scheduler.acquire()
+        scheduler.release(headers(1000, 1, reset))
+        assert scheduler._allowed(scheduler._budget('core')) == 1
+
+    def test_concurrency_limited(self):
+        scheduler = Scheduler(concurrency=4, low=0.1)
+        scheduler.acquire()
+        scheduler.release(headers(1000, 50, time.time() + 3600))
+        acquired = []
+
+        def request():
+            scheduler.acquire()
+            acquired.append(1)
+
+        threads = [threading.Thread(target=request, daemon=True)
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        assert len(acquired) == 2
+        scheduler.release()
+        scheduler.release()
+        for thread in threads:
+            thread.join(5)
+        assert len(acquired) == 4
+
+    def test_backoff_known_reset(self):
+        scheduler = Scheduler()
+        reset = time.time() + 3600
+        scheduler.acquire()
+        scheduler.release(headers(5000, 100, reset))
+        scheduler.backoff()
+        assert scheduler.remaining == 0
+        assert scheduler._delay(time.time(), scheduler._budget('core')) > 0
+        # Budget resets.
+        assert scheduler._delay(reset + 1, scheduler._budget('core')) == 0
+
+    def test_backoff_unknown_reset(self):
+        scheduler = Scheduler()
+        scheduler.backoff()
+        delay = scheduler._delay(time.time(), scheduler._budget('core'))
+        assert 59 < delay <= 60
+
+    def test_backoff_seconds(self):
+        scheduler = Scheduler()
+        scheduler.backoff(0.2)
+        start = time.time()
+        scheduler.acquire()
+        scheduler.release()
+        assert time.time() - start >= 0.15
+
+    def test_update_out_of_order(self):
+        scheduler = Scheduler()
+        reset = time.time() + 3600
+        for remaining in (90, 88, 89,):
+            scheduler._update(headers(100, remaining, reset))
+        assert scheduler.remaining == 88
+
+    def test_update_new_window(self):
+        scheduler = Scheduler()
+        reset = time.time() + 3600
+        scheduler._update(headers(100, 1, reset))
+        scheduler._update(headers(100, 99, reset + 3600))
+        assert scheduler.remaining == 99
+        assert scheduler.reset == int(reset + 3600)
+
+    def test_update_ignores_missing_headers(self):
+        scheduler = Scheduler()
+        scheduler._update({'X-RateLimit-Limit': '100'})
+        assert scheduler.remaining is None
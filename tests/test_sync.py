@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import json
+import hashlib
+
+from psychokinetic.objectstore.sync import Sync, MANIFEST
+
+
+class Response(object):
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class Client(object):
+    # Container in memory, names in fail are rejected. Without hashes the
+    # listing has no checksums, as some object stores.
+    def __init__(self, objects=None, fail=(), hashes=True):
+        self.endpoints = {'katalog': 'http://katalog'}
+        self.objects = objects or {}
+        self.fail = fail
+        self.hashes = hashes
+        self.listed = 0
+        self.uploaded = []
+        self.md5hashes = {}
+        self.deleted = []
+        self.metadata = []
+
+    def iter_objects(self, tenant_id, container):
+        self.listed += 1
+        for name, data in self.objects.items():
+            obj = {'name': name, 'bytes': len(data)}
+            if self.hashes:
+                obj['hash'] = hashlib.md5(data).hexdigest()
+            yield obj
+
+    def bulk_object_metadata(self, tenant_id, container, objects,
+                             workers=8):
+        objects = list(objects)
+        self.metadata.append(objects)
+        for name in objects:
+            if name in self.fail:
+                yield {'name': name, 'status': None, 'response': None,
+                       'error': Exception('metadata failed')}
+                continue
+            md5hash = hashlib.md5(self.objects[name]).hexdigest()
+            yield {'name': name, 'status': 200,
+                   'response': Response({'X-MD5Hash': md5hash}),
+                   'error': None}
+
+    def _name(self, path):
+        return path.strip('/').split('/', 2)[2]
+
+    def _put_object(self, url, path, obj, size, content_type=None,
+                    md5hash=None, timestamp=None):
+        name = self._name(path)
+        if name in self.fail:
+            raise Exception('upload failed')
+        self.objects[name] = obj.read()
+        self.uploaded.append(name)
+        self.md5hashes[name] = md5hash
+
+    def _unlink_object(self, url, path, headers):
+        name = self._name(path)
+        if name in self.fail:
+            raise Exception('delete failed')
+        del self.objects[name]
+        self.deleted.append(name)
+
+
+def write(path, name, data):
+    path = os.path.join(path, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)['objects']
+
+
+class TestSync(object):
+    def test_first_run_lists_container(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'same', b'same')
+        write(path, 'changed', b'new')
+        write(path, 'dir/added', b'added')
+        client = Client({'same': b'same',
+                         'changed': b'old',
+                         'removed': b'removed'})
+
+        sync = Sync(client, 'tenant', 'container', path)
+        objects, uploads, deletes = sync.diff()
+        assert client.listed == 1
+        assert sorted(uploads) == ['changed', 'dir/added']
+        assert deletes == ['removed']
+        assert sorted(objects) == ['changed', 'dir/added', 'same']
+
+        results = list(sync.run())
+        assert all(result['error'] is None for result in results)
+        assert sorted(client.objects) == ['changed', 'dir/added', 'same']
+        assert client.objects['changed'] == b'new'
+        assert sorted(manifest(path)) == ['changed', 'dir/added', 'same']
+
+    def test_second_run_uses_manifest(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'a', b'a')
+        write(path, 'b', b'b')
+        client = Client()
+        list(Sync(client, 'tenant', 'container', path).run())
+        assert client.listed == 1
+
+        write(path, 'b', b'bb')
+        os.remove(os.path.join(path, 'a'))
+        client.uploaded = []
+        sync = Sync(client, 'tenant', 'container', path)
+        objects, uploads, deletes = sync.diff()
+        # Nothing listed, the manifest holds the remote state.
+        assert client.listed == 1
+        assert uploads == ['b']
+        assert deletes == ['a']
+
+        list(sync.run())
+        assert client.uploaded == ['b']
+        assert client.deleted == ['a']
+        assert sorted(manifest(path)) == ['b']
+
+    def test_unchanged_nothing_to_do(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'a', b'a')
+        client = Client()
+        list(Sync(client, 'tenant', 'container', path).run())
+        sync = Sync(client, 'tenant', 'container', path)
+        assert sync.diff()[1:] == ([], [],)
+        assert list(sync.run()) == []
+
+    def test_failed_changes_not_saved(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'ok', b'ok')
+        write(path, 'bad', b'bad')
+        client = Client({'gone': b'gone'}, fail=('bad', 'gone',))
+
+        results = list(Sync(client, 'tenant', 'container', path).run())
+        errors = sorted(result['name'] for result in results
+                        if result['error'] is not None)
+        assert errors == ['bad', 'gone']
+
+        saved = manifest(path)
+        assert 'bad' not in saved
+        assert saved['ok']['hash'] == hashlib.md5(b'ok').hexdigest()
+        # Failed delete remains known remotely, so it is retried.
+        assert saved['gone']['size'] is None
+
+        client.fail = ()
+        sync = Sync(client, 'tenant', 'container', path)
+        objects, uploads, deletes = sync.diff()
+        assert uploads == ['bad']
+        assert deletes == ['gone']
+
+    def test_manifest_of_other_container_ignored(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'a', b'a')
+        client = Client()
+        list(Sync(client, 'tenant', 'container', path).run())
+        Sync(client, 'tenant', 'other', path).diff()
+        assert client.listed == 2
+
+    def test_listing_without_hash(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'same', b'same')
+        write(path, 'changed', b'new')
+        write(path, 'unknown', b'data')
+        client = Client({'same': b'same', 'changed': b'old',
+                         'unknown': b'atad'}, hashes=False)
+        client.fail = ('unknown',)
+
+        objects, uploads, deletes = Sync(client, 'tenant', 'container',
+                                         path).diff()
+        # Checksums of all objects of same size requested at once.
+        assert len(client.metadata) == 1
+        assert sorted(client.metadata[0]) == ['changed', 'same', 'unknown']
+        # Failed to check, so uploaded again.
+        assert sorted(uploads) == ['changed', 'unknown']
+
+    def test_upload_with_hash(self, tmpdir):
+        path = str(tmpdir)
+        write(path, 'a', b'a')
+        client = Client()
+        list(Sync(client, 'tenant', 'container', path).run())
+        assert client.md5hashes == {'a': hashlib.md5(b'a').hexdigest()}
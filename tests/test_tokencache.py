@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import json
+import stat
+import time
+from datetime import datetime, timezone
+
+from pytest import raises
+
+from luxon.utils.http import Client
+
+from psychokinetic.openstack.openstack import Openstack
+from psychokinetic.openstack.tokencache import TokenCache, expires
+
+KEYSTONE = 'http://keystone:5000/v3'
+
+
+def body(seconds):
+    expires_at = datetime.fromtimestamp(time.time() + seconds,
+                                        timezone.utc)
+    return {'token': {'expires_at':
+                      expires_at.strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+                      'project': {'id': 'p1'},
+                      'catalog': []}}
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+class TestExpires(object):
+    def test_expires(self):
+        assert expires({'token': {
+            'expires_at': '2018-01-01T00:00:00.000000Z'}}) == 1514764800
+
+
+class TestTokenCache(object):
+    def test_get_set(self, tmpdir):
+        cache = TokenCache(str(tmpdir))
+        key = (KEYSTONE, 'admin', 'default', None,)
+        assert cache.get(key) is None
+        cache.set(key, 'token', body(3600))
+        cached = cache.get(key)
+        assert cached['token'] == 'token'
+        assert cached['body']['token']['project'] == {'id': 'p1'}
+        assert cached['expires'] == expires(cached['body'])
+        assert cache.get((KEYSTONE, 'admin', 'default', 'p1',)) is None
+        cache.delete(key)
+        assert cache.get(key) is None
+
+    def test_margin(self, tmpdir):
+        cache = TokenCache(str(tmpdir), margin=300)
+        key = (KEYSTONE, 'admin', 'default', None,)
+        cache.set(key, 'token', body(400))
+        assert cache.get(key) is not None
+        # Expires within margin, discarded.
+        cache.set(key, 'token', body(200))
+        assert cache.get(key) is None
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_private(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'tokens')
+        cache = TokenCache(path)
+        assert mode(path) == 0o700
+        cache.set(('key',), 'token', body(3600))
+        for name in os.listdir(path):
+            assert mode(os.path.join(path, name)) == 0o600
+
+    def test_permissions_restricted(self, tmpdir):
+        path = str(tmpdir)
+        os.chmod(path, 0o755)
+        TokenCache(path)
+        assert mode(path) == 0o700
+
+    def test_other_owner(self, tmpdir, monkeypatch):
+        uid = os.getuid()
+        monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+        with raises(PermissionError):
+            TokenCache(str(tmpdir))
+
+    def test_corrupt(self, tmpdir):
+        cache = TokenCache(str(tmpdir))
+        cache.set(('key',), 'token', body(3600))
+        for name in os.listdir(str(tmpdir)):
+            with open(os.path.join(str(tmpdir), name), 'w') as f:
+                f.write('{')
+        assert cache.get(('key',)) is None
+
+
+class Response(object):
+    def __init__(self, token, body):
+        self.headers = {'x-subject-token': token}
+        self.json = body
+
+
+class TestIdentity(object):
+    def keystone(self, monkeypatch):
+        sent = []
+
+        def execute(self, method, url, params=None, data=None, **kwargs):
+            if isinstance(data, str):
+                data = json.loads(data)
+            sent.append(data)
+            return Response('token%s' % len(sent), body(3600))
+
+        monkeypatch.setattr(Client, 'execute', execute)
+        return sent
+
+    def openstack(self, tmpdir):
+        return Openstack(KEYSTONE, token_cache=TokenCache(str(tmpdir)))
+
+    def test_authenticate_cached(self, tmpdir, monkeypatch):
+        sent = self.keystone(monkeypatch)
+        self.openstack(tmpdir).identity.authenticate('admin', 'secret',
+                                                     'default')
+        os = self.openstack(tmpdir)
+        os.identity.authenticate('admin', 'secret', 'default')
+        assert len(sent) == 1
+        assert os._login_token == os['X-Auth-Token'] == 'token1'
+
+    def test_other_password_not_cached(self, tmpdir, monkeypatch):
+        sent = self.keystone(monkeypatch)
+        self.openstack(tmpdir).identity.authenticate('admin', 'secret',
+                                                     'default')
+        self.openstack(tmpdir).identity.authenticate('admin', 'guess',
+                                                     'default')
+        assert len(sent) == 2
+
+    def test_scope_cached(self, tmpdir, monkeypatch):
+        sent = self.keystone(monkeypatch)
+        for i in range(2):
+            os = self.openstack(tmpdir)
+            os.identity.authenticate('admin', 'secret', 'default')
+            os.identity.scope(project_id='p1')
+        # Login and scoped token requested once.
+        assert len(sent) == 2
+        assert os._scoped_token == os['X-Auth-Token'] == 'token2'
+        assert os['project_id_header'] == 'p1'
+
+        os.identity.scope(project_name='admin', domain='default')
+        assert len(sent) == 3
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2020 Christiaan Frans Rademan <chris@fwiw.co.za>.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import time
+import threading
+
+from psychokinetic.utils.workers import prefetch, imap, chunks, status_of
+
+
+def counted(items, consumed):
+    # Generator recording how many items were consumed.
+    for item in items:
+        consumed.append(item)
+        yield item
+
+
+class Error(Exception):
+    pass
+
+
+class ErrorResponse(object):
+    status_code = 503
+
+
+class TestPrefetch(object):
+    def test_order(self):
+        assert list(prefetch(iter(range(100)))) == list(range(100))
+
+    def test_empty(self):
+        assert list(prefetch([])) == []
+
+    def test_one_ahead(self):
+        consumed = []
+        items = prefetch(counted(range(100), consumed))
+        assert next(items) == 0
+        time.sleep(0.05)
+        assert len(consumed) == 2
+
+    def test_close_early(self):
+        consumed = []
+        items = prefetch(counted(range(100), consumed))
+        next(items)
+        items.close()
+        assert len(consumed) <= 2
+
+    def test_background(self):
+        threads = []
+
+        def produce():
+            for i in range(3):
+                threads.append(threading.current_thread())
+                yield i
+
+        list(prefetch(produce()))
+        assert threading.current_thread() not in threads
+
+
+class TestImap(object):
+    def test_ordered(self):
+        def slow(item):
+            time.sleep((10 - item) / 1000.0)
+            return item * 2
+
+        results = [(item, future.result())
+                   for item, future in imap(slow, range(10), workers=4)]
+        assert results == [(i, i * 2) for i in range(10)]
+
+    def test_unordered(self):
+        def slow(item):
+            time.sleep(0.1 if item == 0 else 0)
+            return item
+
+        results = imap(slow, range(5), workers=5, ordered=False)
+        items = [item for item, future in results]
+        assert sorted(items) == list(range(5))
+        assert items[-1] == 0
+
+    def test_exceptions_on_future(self):
+        def fail(item):
+            raise ValueError(item)
+
+        for item, future in imap(fail, range(3)):
+            assert isinstance(future.exception(), ValueError)
+
+    def test_lazy(self):
+        consumed = []
+        results = imap(lambda item: item, counted(range(1000), consumed),
+                       workers=2)
+        next(results)
+        assert len(consumed) <= 2 * 2 + 1
+
+    def test_close_early(self):
+        consumed = []
+        for ordered in (True, False,):
+            del consumed[:]
+            results = imap(lambda item: item,
+                           counted(range(1000), consumed),
+                           workers=2, ordered=ordered)
+            next(results)
+            results.close()
+            assert len(consumed) <= 2 * 2 + 1
+
+
+class TestChunks(object):
+    def test_chunks(self):
+        assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_empty(self):
+        assert list(chunks([], 2)) == []
+
+
+class TestStatusOf(object):
+    def test_status(self):
+        error = Error()
+        error.status = '404 Not Found'
+        assert status_of(error) == 404
+
+    def test_response(self):
+        error = Error()
+        error.response = ErrorResponse()
+        assert status_of(error) == 503
+
+    def test_unknown(self):
+        assert status_of(Error()) is None